@@ -20,7 +20,7 @@ class AnalysisTab(ctk.CTkFrame):
         self.errors = errors
 
         # add sub-tabs
-        self.tabs = ctk.CTkTabview(self)
+        self.tabs = ctk.CTkTabview(self, command=self.tab_changed)
         self.tabs.add("Traces")
         self.tabs.add("Correlation")
         self.left_align_tabs()
@@ -45,6 +45,10 @@ class AnalysisTab(ctk.CTkFrame):
                                  fill='both')
         self.tabs.pack(padx=5, pady=0, anchor='center',expand=True,fill='both')
 
+    def tab_changed(self):
+        # once the new tab is laid out, draw what changed while it was hidden
+        self.after_idle(self.filtered_data_updates.update_dirty)
+
     def left_align_tabs(self):
         self.tabs._segmented_button.grid(row=1, rowspan=2, column=0, \
             columnspan=1, padx=self.tabs._apply_widget_scaling(\
@@ -89,6 +93,8 @@ class TracesTab(ctk.CTkFrame):
                                         label_text="X-Y Correlations",\
                                         axis_1_label="X Correlations",\
                                         axis_2_label="Y Correlations")
+        self.correlations.label_axes("$X_i$ (pixels)", "$X_s$ (pixels)", \
+                                     "$Y_i$ (pixels)", "$Y_s$ (pixels)")
         self.traces = SubplotCanvas(master=self, mode='save only', \
                                     cwidth=375, cheight=750, \
                                     label_text="X-Y Correlation Traces", \
@@ -132,14 +138,8 @@ class TracesTab(ctk.CTkFrame):
         self.traceinfo_y.grid(row=1,column=2,padx=(3,5),pady=(0,5),sticky='ew')
 
     def update_correlations(self, data:ReferentialNpArray):
-        self.correlations.ax_1.clear()
-        self.correlations.ax_2.clear()
-        self.correlations.ax_1.set_xlabel("$X_i$ (pixels)")
-        self.correlations.ax_1.set_ylabel("$X_s$ (pixels)")
-        self.correlations.ax_2.set_xlabel("$Y_i$ (pixels)")
-        self.correlations.ax_2.set_ylabel("$Y_s$ (pixels)")
-
-        t3view.plot_correlations(data.get(), fig=self.correlations.figure)
+        self.correlations.show_images(*view_cache.get(data, \
+                                                      correlation_images))
         self.correlations.show_1(self.x_loc.get())
         self.correlations.show_2(self.y_loc.get())
         self.correlations.redraw()
@@ -164,7 +164,8 @@ class TracesTab(ctk.CTkFrame):
                 self.xtracemax.set(sig)
 
             self.traces.ax_1.clear()
-            (fig,out,allout) = t3view.plot_coincidence_trace(data.get()[:,0,:],\
+            (fig,out,allout) = t3view.plot_coincidence_trace(\
+                                                view_of(data.get(), (slice(None),0)),\
                                                 self.x_loc.get(), \
                                                 self.x_orientation.get(), \
                                                 self.xtracemin.get(),\
@@ -202,7 +203,8 @@ class TracesTab(ctk.CTkFrame):
                 self.ytracemax.set(idl)
 
             self.traces.ax_2.clear()
-            (fig,out,allout) = t3view.plot_coincidence_trace(data.get()[:,1,:],\
+            (fig,out,allout) = t3view.plot_coincidence_trace(\
+                                                view_of(data.get(), (slice(None),1)),\
                                                 self.y_loc.get(), \
                                                 self.y_orientation.get(), \
                                                 self.ytracemin.get(),\
@@ -323,6 +325,8 @@ class CorrelationTab(ctk.CTkFrame):
         self.plot = CanvasFrame(master=self, label_text='X-Y Correlations', \
                                 mode='cursor', zoom=True, cwidth=750, \
                                 cheight=750)
+        self.plot.ax.set_title('Coincidences')
+        self.image = None
         self.plotcontrol = XYControl(master=self, label_text='X-Y Control')
 
         # modify widgets
@@ -334,11 +338,8 @@ class CorrelationTab(ctk.CTkFrame):
         self.plotcontrol.grid(row=0,column=1,padx=(3,5),pady=5,sticky='ew')
 
     def update_plot(self, data:ReferentialNpArray):
-        self.plot.ax.clear()
-        self.plot.ax.set_title('Coincidences')
-
-        (fig, view) = t3view.plot_coincidence_xy(data.get(), \
-                                                 fig=self.plot.figure)
+        view = view_cache.get(data, coincidence_xy_image)
+        self.image = self.plot.show_image(self.plot.ax, self.image, view)
 
         max_ind = np.unravel_index(view.argmax(), view.shape)
         self.plotcontrol.update_center(np.mean(max_ind[0]), np.mean(max_ind[1])) #type:ignore
@@ -23,8 +23,9 @@ class App(ctk.CTk):
         self.raw_data = ReferentialNpArray()
         self.filtered_data = ReferentialNpArray()
         self.errors = ErrorBox(master=self, label_text="Errors")
-        self.raw_data_updates = CanvasList(self.raw_data)
-        self.filtered_data_updates = CanvasList(self.filtered_data)
+        self.jobs = JobRunner(self)
+        self.raw_data_updates = CanvasList(self.raw_data, root=self)
+        self.filtered_data_updates = CanvasList(self.filtered_data, root=self)
         try:
             self.recall = RecallFile()
         except Exception as e:
@@ -35,7 +36,7 @@ class App(ctk.CTk):
         self.set_mpl_params()
 
         # create tabs
-        self.tabs = ctk.CTkTabview(self)
+        self.tabs = ctk.CTkTabview(self, command=self.tab_changed)
         self.tabs.add("Load")
         self.tabs.add("Filter")
         self.tabs.add("Analysis")
@@ -48,6 +49,8 @@ class App(ctk.CTk):
                                filtered_data=self.filtered_data,
                                raw_data_updates=self.raw_data_updates,
                                filtered_data_updates=self.filtered_data_updates,
+                               jobs=self.jobs,
+                               parameters=self.current_parameters,
                                errors=self.errors)
         self.filtertab = FilterTab(master=self.tabs.tab("Filter"),
                                    raw_data=self.raw_data, 
@@ -87,6 +90,11 @@ class App(ctk.CTk):
             mpl.rcParams['axes.labelcolor'] = '#DCE4EE'
             mpl.rcParams['figure.facecolor'] = '#2B2B2B'
 
+    def tab_changed(self):
+        # once the new tab is laid out, draw what changed while it was hidden
+        self.after_idle(self.raw_data_updates.update_dirty)
+        self.after_idle(self.filtered_data_updates.update_dirty)
+
     def left_align_tabs(self):
         self.tabs._segmented_button.grid(row=1, rowspan=2, column=0, \
             columnspan=1, padx=self.tabs._apply_widget_scaling(\
@@ -98,14 +106,16 @@ class App(ctk.CTk):
                 pady=self.tabs._apply_widget_scaling(max(\
                 self.tabs._corner_radius, self.tabs._border_width)))
             
-    def save_state(self,file_name:str=''):
+    def current_parameters(self) -> dict:
         # settings saving should be handled by tab root and passed to children
         new_params = self.recall.parameters.copy()
         
         self.loadtab.save(new_params)
         self.filtertab.save(new_params)
+        return new_params
 
-        self.recall.write_file(new_params, file_name)
+    def save_state(self,file_name:str=''):
+        self.recall.write_file(self.current_parameters(), file_name)
 
     def recall_all(self):
         # settings recall should be handled by tab root and passed to children
@@ -123,6 +133,7 @@ class App(ctk.CTk):
 
     def quit_cleanup(self):
         self.save_state()
+        self.jobs.shutdown()
         self.quit()
 
 if __name__ == "__main__":
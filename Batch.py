@@ -0,0 +1,119 @@
+'''
+Headless batch processing of a whole directory of .tpx3 files, using the same
+pipeline (and cache) as the GUI without ever importing tkinter.
+
+The settings are read from a file in the same format as "recall.t3w", which
+means that the easiest way to make one is to set everything up in the GUI,
+close it, and copy its "recall.t3w". For every raw file the time filtered
+coincidences are written to <name>.npy, and a summary of every run is written
+to summary.csv, all in the output directory.
+
+usage: python Batch.py settings.t3w data_dir [-o out_dir] [-j jobs] [-c MB]
+'''
+import os
+import csv
+import time
+import argparse
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import tpx3_toolkit as t3
+import tpx3_toolkit.filter as t3filter
+from Pipeline import *
+
+def read_settings(recall:RecallFile) -> tuple[tuple,int,int]:
+    '''
+    Returns the arguments of process_stream after the file name and chunk size,
+    followed by the time filter range
+    '''
+    p = recall.parameters
+    args = (p['calib_file'],
+            [t3.Beam.fromString(p['beamS'])],
+            [t3.Beam.fromString(p['beamI'])],
+            int(float(p['timeWindow'])),
+            int(float(p['spaceWindow'])),
+            int(float(p['coincWindow'])),
+            int(float(p['clusterRange'])),
+            int(float(p['numScans'])))
+    return (args, int(float(p['fmin'])), int(float(p['fmax'])))
+
+def run_file(file_name:str, out_dir:str, chunk_MB:float, args:tuple, \
+             fmin:int, fmax:int) -> dict:
+    # module level so that it can be sent to worker processes
+    name = os.path.splitext(os.path.basename(file_name))[0]
+    size_MB = os.stat(file_name).st_size / 1024**2
+    metrics = {'file': file_name, 'size_MB': f'{size_MB:.1f}',
+               'coincidences': 0, 'filtered': 0, 'seconds': 0, 'MB/s': 0,
+               'error': ''}
+    start = time.time()
+    try:
+        data = process_cached(process_stream, file_name, chunk_MB, *args)
+        filtered = t3filter.time_filter(data, fmin, fmax)
+        np.save(os.path.join(out_dir, name + '.npy'), filtered)
+        metrics['coincidences'] = data.shape[2]
+        metrics['filtered'] = filtered.shape[2]
+    except Exception as e:
+        metrics['error'] = repr(e)
+    seconds = time.time() - start
+    metrics['seconds'] = f'{seconds:.1f}'
+    metrics['MB/s'] = f'{size_MB / seconds:.1f}' if seconds > 0 else '0'
+    return metrics
+
+def main():
+    parser = argparse.ArgumentParser(description='Process a directory of ' +\
+                                     '.tpx3 files without the GUI.')
+    parser.add_argument('settings', help='settings file in the format of ' +\
+                        'recall.t3w')
+    parser.add_argument('data_dir', help='directory of .tpx3 files')
+    parser.add_argument('-o', '--out_dir', default='', help='where the ' +\
+                        '.npy files and summary.csv go (default: data_dir)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(), \
+                        help='number of files processed at once ' +\
+                        '(default: one per core)')
+    parser.add_argument('-c', '--chunk_MB', type=float, default=500, \
+                        help='files bigger than this are processed in ' +\
+                        'chunks of this many MB, 0 to never chunk ' +\
+                        '(default: 500)')
+    opts = parser.parse_args()
+
+    if not(os.path.isfile(opts.settings)):
+        parser.error(f'settings file "{opts.settings}" does not exist')
+    (args, fmin, fmax) = read_settings(RecallFile(opts.settings))
+    out_dir = opts.out_dir if len(opts.out_dir) > 0 else opts.data_dir
+    os.makedirs(out_dir, exist_ok=True)
+
+    files = sorted(os.path.join(opts.data_dir, f) \
+                   for f in os.listdir(opts.data_dir) if f.endswith('.tpx3'))
+    if len(files) == 0:
+        parser.error(f'no .tpx3 files in "{opts.data_dir}"')
+
+    summary = []
+    start = time.time()
+    with ProcessPoolExecutor(max_workers=max(1, opts.jobs)) as pool:
+        futures = []
+        for file_name in files:
+            # small files are not worth chunking
+            size_MB = os.stat(file_name).st_size / 1024**2
+            chunk_MB = opts.chunk_MB if size_MB > opts.chunk_MB else 0
+            futures.append(pool.submit(run_file, file_name, out_dir, \
+                                       chunk_MB, args, fmin, fmax))
+        for (i, future) in enumerate(as_completed(futures)):
+            metrics = future.result()
+            summary.append(metrics)
+            status = metrics['error'] if len(metrics['error']) > 0 else \
+                f"{metrics['coincidences']} coincidences at " +\
+                f"{metrics['MB/s']}MB/s"
+            print(f"[{i+1}/{len(files)}] " +\
+                  f"{os.path.basename(metrics['file'])}: {status}", flush=True)
+
+    summary.sort(key=lambda m: m['file'])
+    with open(os.path.join(out_dir, 'summary.csv'), 'w', newline='') as f:
+        w = csv.DictWriter(f, fieldnames=summary[0].keys())
+        w.writeheader()
+        w.writerows(summary)
+
+    failed = sum(1 for m in summary if len(m['error']) > 0)
+    print(f'Done in {time.time() - start:.1f}s, {failed} file(s) failed.')
+
+if __name__ == "__main__":
+    main()
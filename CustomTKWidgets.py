@@ -84,6 +84,7 @@ class CanvasFrame(LabeledFrame):
         self.lasthline = None
         self.clickvline = None
         self.clickhline = None
+        self.background = None
 
         # create 2x1 grid where the graph object is resizeable and the statusbar
         # is  not
@@ -106,6 +107,7 @@ class CanvasFrame(LabeledFrame):
         self.canvas.get_tk_widget().grid(row=0, column=0, columnspan=4,\
             sticky='nsew',padx=3,pady=3)
         self.canvas.get_tk_widget().configure(width=cwidth,height=cheight)
+        self.canvas.mpl_connect('draw_event', self.drawn)
 
         if mode == 'cursor':        
             self.mouse_move = self.canvas.mpl_connect('motion_notify_event',\
@@ -184,6 +186,50 @@ class CanvasFrame(LabeledFrame):
     def redraw(self):
         self.canvas.draw()
 
+    @staticmethod
+    def show_image(ax, artist, image:np.ndarray):
+        # an image already on ax is given the new data instead of replaced
+        if artist is None or artist.axes is not ax:
+            return ax.imshow(image, origin='lower')
+        (height, width) = image.shape[:2]
+        artist.set_data(image)
+        artist.set_extent((-0.5, width - 0.5, -0.5, height - 0.5))
+        artist.autoscale() # color limits
+        ax.set_xlim(-0.5, width - 0.5)
+        ax.set_ylim(-0.5, height - 0.5)
+        return artist
+
+    def drawn(self, event):
+        # the overlay is left out of full draws, so this is everything else
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self.draw_overlay()
+
+    def draw_overlay(self):
+        # cursors and click markers are animated so they can be blitted
+        for ax in self.figure.axes:
+            for line in ax.lines:
+                if line.get_animated():
+                    ax.draw_artist(line)
+
+    def blit(self):
+        # redraws only the overlay on top of the last full draw, unless
+        # something else changed since (animated artists never mark it stale)
+        if self.background is None or self.figure.stale:
+            self.redraw()
+            return
+        self.canvas.restore_region(self.background)
+        self.draw_overlay()
+        self.canvas.blit(self.figure.bbox)
+
+    @staticmethod
+    def remove_line(line):
+        # the line may already be gone if its axes were cleared
+        if line is not None:
+            try:
+                line.remove()
+            except (ValueError, NotImplementedError):
+                pass
+
 # this probably should not be here because it requires hooking up A LOT of stuff
 #    def replace_figure(self, figure:Figure):
 #        self.figure = figure
@@ -207,11 +253,19 @@ class CanvasFrame(LabeledFrame):
             self.statusbartext.set(f"ZOOM: Mouse Position ({self.x:.0f},{self.y:.0f})")
 
     def update_cursor(self):
-        if self.lastvline is not None: self.lastvline.remove()
-        self.lastvline = self.ax.axvline(self.x,color="gray",ls=":")
-        if self.lasthline is not None: self.lasthline.remove()
-        self.lasthline = self.ax.axhline(self.y,color="gray",ls=":")
-        self.redraw()
+        if self.lastvline is None or self.lastvline.axes is not self.ax:
+            self.remove_line(self.lastvline)
+            self.lastvline = self.ax.axvline(self.x,color="gray",ls=":",\
+                animated=True)
+        else:
+            self.lastvline.set_xdata([self.x, self.x])
+        if self.lasthline is None or self.lasthline.axes is not self.ax:
+            self.remove_line(self.lasthline)
+            self.lasthline = self.ax.axhline(self.y,color="gray",ls=":",\
+                animated=True)
+        else:
+            self.lasthline.set_ydata([self.y, self.y])
+        self.blit()
 
     def remove_mouse(self,event):
         self.configure(cursor="none")
@@ -221,16 +275,18 @@ class CanvasFrame(LabeledFrame):
 
     def clicked(self,event):
         if self.clickvline is not None: 
-            self.clickvline.remove()
+            self.remove_line(self.clickvline)
             self.clickvline = None
         else:
-            self.clickvline = self.ax.axvline(self.x,color="gray",ls=":")
+            self.clickvline = self.ax.axvline(self.x,color="gray",ls=":",\
+                animated=True)
 
         if self.clickhline is not None:
-            self.clickhline.remove()
+            self.remove_line(self.clickhline)
             self.clickhline = None
         else:
-            self.clickhline = self.ax.axhline(self.y,color="gray",ls=":")
+            self.clickhline = self.ax.axhline(self.y,color="gray",ls=":",\
+                animated=True)
 
         if self.state == 'normal':
             self.prevclickx = self.clickx
@@ -244,7 +300,7 @@ class CanvasFrame(LabeledFrame):
             if self.clicks == 2:
                 self.zoom()
 
-        self.redraw()
+        self.blit()
 
     def get_clicks(self) -> tuple[int,int,int,int]:
         # Return clicks as left, bottom, right, top
@@ -279,18 +335,15 @@ class CanvasFrame(LabeledFrame):
         if hasattr(self,'savebutton'): self.savebutton.grid_forget()
         if hasattr(self,'zoombutton'): self.zoombutton.grid_forget()
         if hasattr(self,'homebutton'): self.homebutton.grid_forget()
-        if not(self.lasthline is None): 
-            self.lasthline.remove()
-            self.lasthline = None
-        if not(self.lastvline is None): 
-            self.lastvline.remove()
-            self.lastvline = None
-        if not(self.clickhline is None): 
-            self.clickhline.remove()
-            self.clickhline = None
-        if not(self.clickvline is None): 
-            self.clickvline.remove()
-            self.clickvline = None
+        self.remove_line(self.lasthline)
+        self.lasthline = None
+        self.remove_line(self.lastvline)
+        self.lastvline = None
+        self.remove_line(self.clickhline)
+        self.clickhline = None
+        self.remove_line(self.clickvline)
+        self.clickvline = None
+        self.redraw() # the removed lines are still in the last draw
 
         if mode == 'cursor':        
             self.mouse_move = self.canvas.mpl_connect('motion_notify_event',\
@@ -347,6 +400,8 @@ class SubplotCanvas(CanvasFrame):
         self.ax = None
         self.ax_1 = self.figure.add_subplot(211) # type: ignore
         self.ax_2 = self.figure.add_subplot(212) # type: ignore
+        self.image_1 = None
+        self.image_2 = None
         self.xlimh2 = self.xlim
         self.ylimh2 = self.ylim
 
@@ -366,6 +421,17 @@ class SubplotCanvas(CanvasFrame):
         self.configure(cursor="")
         self.ax = None
 
+    def label_axes(self, xlabel_1:str, ylabel_1:str, xlabel_2:str, \
+                   ylabel_2:str):
+        self.ax_1.set_xlabel(xlabel_1)
+        self.ax_1.set_ylabel(ylabel_1)
+        self.ax_2.set_xlabel(xlabel_2)
+        self.ax_2.set_ylabel(ylabel_2)
+
+    def show_images(self, image_1:np.ndarray, image_2:np.ndarray):
+        self.image_1 = self.show_image(self.ax_1, self.image_1, image_1)
+        self.image_2 = self.show_image(self.ax_2, self.image_2, image_2)
+
     def rename_plots(self, name_top, name_bottom):
         self.ax_1.set_title(name_top)
         self.ax_2.set_title(name_bottom)
@@ -437,20 +503,27 @@ class TraceCanvas(SubplotCanvas):
 
     def update_cursor(self):
         if self.ax is self.ax_1:
-            while len(self.ax.lines) > 1:  #type:ignore
-                self.ax.lines[-1].remove() #type:ignore
-            if self.orientation.get() == 'x': #type:ignore
-                self.lasthline = self.ax.axhline(self.y, color='gray',ls=':') #type:ignore
-            else:
-                self.lasthline = self.ax.axvline(self.x, color='gray',ls=':') #type:ignore
+            self.lasthline = self.cursor_line(self.lasthline)
         elif self.ax is self.ax_2:
-            while len(self.ax.lines) > 1:  #type:ignore
-                self.ax.lines[-1].remove() #type:ignore
-            if self.orientation.get() == 'x': #type:ignore
-                self.lastvline = self.ax.axhline(self.y, color='gray',ls=':') #type:ignore
+            self.lastvline = self.cursor_line(self.lastvline)
+        self.blit()
+
+    def cursor_line(self, line):
+        # only replaced when the orientation changes, otherwise just moved
+        horizontal = self.orientation.get() == 'x' #type:ignore
+        if line is None or line.axes is not self.ax or \
+            getattr(line, 'horizontal', None) != horizontal:
+            self.remove_line(line)
+            if horizontal:
+                line = self.ax.axhline(self.y, color='gray',ls=':',animated=True) #type:ignore
             else:
-                self.lastvline = self.ax.axvline(self.x, color='gray',ls=':') #type:ignore
-        self.redraw()
+                line = self.ax.axvline(self.x, color='gray',ls=':',animated=True) #type:ignore
+            line.horizontal = horizontal
+        elif horizontal:
+            line.set_ydata([self.y, self.y])
+        else:
+            line.set_xdata([self.x, self.x])
+        return line
 
     def show_1(self, loc):
         while len(self.ax_1.lines) > 0: 
@@ -496,22 +569,25 @@ class HistogramCanvas(CanvasFrame):
         self.redraw()
 
     def update_cursor(self):
-        if self.lastvline is not None: self.lastvline.remove()
-        self.lastvline = self.ax.axvline(self.x,color="gray",ls=":")
-        if self.lasthline is not None: self.lasthline.remove()
-        self.lasthline = self.ax.axvline(self.x,color="gray",ls=":")
-        self.redraw()
+        if self.lastvline is None or self.lastvline.axes is not self.ax:
+            self.remove_line(self.lastvline)
+            self.lastvline = self.ax.axvline(self.x,color="gray",ls=":",\
+                animated=True)
+        else:
+            self.lastvline.set_xdata([self.x, self.x])
+        self.blit()
 
     def clicked(self,event):
-        if self.clickhline is not None: self.clickhline.remove() 
+        self.remove_line(self.clickhline)
 
         self.clickhline = self.clickvline # hline -> 2 clicks ago
-        self.clickvline = self.ax.axvline(self.x,color="gray",ls=":") # vline -> last click
+        self.clickvline = self.ax.axvline(self.x,color="gray",ls=":",\
+            animated=True) # vline -> last click
 
         self.prevclickx = self.clickx
         self.clickx = self.x # closest integer value
 
-        self.redraw() # I fixed the bug here
+        self.blit()
 
     def get_clicks(self) -> tuple[int,int]:
         # Return clicks as x1,x2
@@ -523,12 +599,12 @@ class HistogramCanvas(CanvasFrame):
             self.clickx = None
             self.prevclickx = None
 
-            if self.clickhline is not None: self.clickhline.remove() 
-            if self.clickvline is not None: self.clickvline.remove() 
+            self.remove_line(self.clickhline)
+            self.remove_line(self.clickvline)
             self.clickhline = None
             self.clickvline = None
-            if self.fbarmin is not None: self.fbarmin.remove()
-            if self.fbarmax is not None: self.fbarmax.remove()
+            self.remove_line(self.fbarmin)
+            self.remove_line(self.fbarmax)
 
             self.fbarmin = self.ax.axvline(x1,color="black") #BUG: not showing up
             self.fbarmax = self.ax.axvline(x2,color="black") #BUG: not showing up
@@ -0,0 +1,681 @@
+import os
+import json
+import zlib
+import struct
+import numpy as np
+from contextlib import contextmanager
+from typing import Callable
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from Pipeline import *
+
+# Reading and writing processed coincidences, kept free of tkinter like
+# Pipeline so that it can be used by Batch.py and worker processes
+
+def narrow(column:np.ndarray) -> np.ndarray:
+    '''
+    The column in the smallest dtype which holds every value exactly, e.g.
+    uint8 for pixel coordinates, or the column itself if none is smaller
+    '''
+    if column.size == 0:
+        return column
+    if column.dtype.kind == 'f':
+        integral = bool(np.all(np.isfinite(column))) and \
+            bool(np.all(column == np.round(column)))
+    else:
+        integral = column.dtype.kind in 'iu'
+    if integral:
+        (lo, hi) = (column.min(), column.max())
+        for dtype in (np.uint8, np.int8, np.uint16, np.int16, np.uint32, \
+                      np.int32, np.int64):
+            info = np.iinfo(dtype)
+            if info.min <= lo and hi <= info.max:
+                if np.dtype(dtype).itemsize < column.dtype.itemsize:
+                    return column.astype(dtype)
+                return column
+    if column.dtype.itemsize > 4:
+        small = column.astype(np.float32)
+        if np.array_equal(small.astype(column.dtype), column):
+            return small
+    return column
+
+def read_npy_header(file_name:str) -> tuple[tuple,np.dtype,bool,int]:
+    '''
+    Reads only the header of a .npy file.
+
+    # Returns
+    (shape, dtype, fortran_order, offset) where offset is the byte at which
+    the array data starts
+    '''
+    with open(file_name, 'rb') as f:
+        version = np.lib.format.read_magic(f)
+        if version == (1,0):
+            header = np.lib.format.read_array_header_1_0(f)
+        else:
+            header = np.lib.format.read_array_header_2_0(f)
+        (shape, fortran_order, dtype) = header
+        return (shape, dtype, fortran_order, f.tell())
+
+def read_npy_into(file_name:str, out:np.ndarray, token:CancelToken|None=None):
+    '''
+    Reads a (2, k, n) .npy file straight into out, which must have the same
+    shape but can be a slice of a larger array along its last axis
+    '''
+    (shape, dtype, fortran_order, offset) = read_npy_header(file_name)
+    if tuple(shape) != out.shape:
+        raise ValueError(f'"{file_name}" has shape {shape}, expected ' +\
+                         f'{out.shape}')
+    if fortran_order or dtype != out.dtype or dtype.hasobject:
+        # not laid out like out, let numpy convert it
+        out[...] = np.load(file_name)
+        return
+    with open(file_name, 'rb') as f:
+        f.seek(offset)
+        # each row is contiguous in both the file and out
+        for i in range(shape[0]):
+            for j in range(shape[1]):
+                if token is not None:
+                    token.check()
+                row = memoryview(out[i,j,:]).cast('B')
+                if f.readinto(row) != row.nbytes:
+                    raise EOFError(f'"{file_name}" is truncated')
+
+def load_npy_files(file_names:list[str], progress:Progress|None=None, \
+                   token:CancelToken|None=None, \
+                   max_workers:int|None=None) -> np.ndarray:
+    '''
+    Loads and joins (2, k, n) .npy files along their last axis in a single
+    pass, by reading every header first and then reading each file straight
+    into its slice of the final array.
+
+    # Parameters
+    file_names:list[str]
+        The .npy files to join, in order
+    progress:Progress|None
+        Optional. Advanced by the size of each file as it is read
+    token:CancelToken|None
+        Optional. Checked between rows
+    max_workers:int|None
+        Optional. Number of files read at once, defaults to one per core up
+        to 8
+
+    # Returns
+    The joined (2, k, N) array
+    '''
+    headers = [read_npy_header(file_name) for file_name in file_names]
+    shapes = [shape for (shape, _, _, _) in headers]
+    for (file_name, shape) in zip(file_names, shapes):
+        if len(shape) != 3 or shape[:2] != shapes[0][:2]:
+            raise ValueError(f'"{file_name}" has shape {shape}, which cannot '+\
+                             f'be joined with shape {shapes[0]}')
+    dtype = np.result_type(*(dtype for (_, dtype, _, _) in headers))
+    stops = np.cumsum([shape[2] for shape in shapes])
+    starts = stops - [shape[2] for shape in shapes]
+
+    out = np.empty(shapes[0][:2] + (int(stops[-1]),), dtype=dtype)
+    sizes = [os.stat(file_name).st_size for file_name in file_names]
+    if progress is not None:
+        progress.begin(sum(sizes), f'Importing {len(file_names)} file(s)')
+    if max_workers is None:
+        max_workers = min(8, os.cpu_count() or 1)
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(read_npy_into, file_name, \
+                               out[:,:,start:stop], token): size \
+                   for (file_name, start, stop, size) in \
+                   zip(file_names, starts, stops, sizes)}
+        for future in as_completed(futures):
+            future.result()
+            if progress is not None:
+                progress.advance(futures[future])
+    return out
+
+class VirtualArray:
+    '''
+    Several (2, k, n) .npy files joined along their last axis without loading
+    them, for datasets which do not fit in memory. The files are memory
+    mapped and only read when indexed or iterated over in chunks.
+
+    Indexing reads only what was asked for, e.g. data[1,2,:] reads a single
+    row of every file. Anything which needs the whole array at once (e.g.
+    np.asarray) still loads all of it, so the GUI goes through the helpers
+    below, which work chunk by chunk.
+
+    # Parameters
+    file_names:list[str]
+        The .npy files to join, in order
+    chunk_size:int
+        Optional. Number of coincidences per chunk in chunks()
+    '''
+    def __init__(self, file_names:list[str], chunk_size:int=2**22):
+        self.file_names = list(file_names)
+        self.chunk_size = chunk_size
+        self.arrays = [np.load(file_name, mmap_mode='r') \
+                       for file_name in self.file_names]
+        for (file_name, array) in zip(self.file_names, self.arrays):
+            if array.ndim != 3 or array.shape[:2] != self.arrays[0].shape[:2]:
+                raise ValueError(f'"{file_name}" has shape {array.shape}, ' +\
+                                 'which cannot be joined with shape ' +\
+                                 f'{self.arrays[0].shape}')
+        self.dtype = np.result_type(*self.arrays)
+        self.shape = self.arrays[0].shape[:2] + \
+            (sum(array.shape[2] for array in self.arrays),)
+        self.ndim = 3
+        self.size = int(np.prod(self.shape))
+        self.nbytes = self.size * self.dtype.itemsize
+
+    def chunks(self):
+        # in memory (2, k, <=chunk_size) pieces, in order
+        for array in self.arrays:
+            for start in range(0, array.shape[2], self.chunk_size):
+                yield np.array(array[:,:,start:start + self.chunk_size], \
+                               dtype=self.dtype)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        parts = [np.asarray(array[key[:2]], dtype=self.dtype) \
+                 for array in self.arrays]
+        return np.concatenate(parts, axis=-1)[..., key[2]]
+
+    def __array__(self, dtype=None, copy=None):
+        data = np.concatenate(self.arrays, axis=2)
+        return data if dtype is None else data.astype(dtype)
+
+    def sample(self, max_points:int) -> np.ndarray:
+        # every step-th coincidence, so that at most max_points are loaded
+        step = max(1, -(-self.shape[2] // max_points))
+        parts = []
+        offset = 0
+        for array in self.arrays:
+            parts.append(np.asarray(array[:,:,(-offset) % step::step], \
+                                    dtype=self.dtype))
+            offset += array.shape[2]
+        return np.concatenate(parts, axis=2)
+
+# Largest number of coincidences drawn by a view of a VirtualArray
+VIEW_POINTS = 2**24
+
+def view_of(data:np.ndarray|VirtualArray, key=slice(None)) -> np.ndarray:
+    '''
+    data[key] to draw, as a plain array. A VirtualArray is first thinned out
+    evenly to at most VIEW_POINTS coincidences. Anything else (e.g. a
+    CoincidenceArray or FilteredView) is only indexed, so just the rows in
+    key are built rather than the whole (2, k, N) array.
+    '''
+    if isinstance(data, VirtualArray):
+        return data.sample(VIEW_POINTS)[key]
+    return np.asarray(data[key])
+
+def filter_chunked(function:Callable, data:np.ndarray|VirtualArray, \
+                   *args) -> np.ndarray:
+    '''
+    Applies a filter which treats each coincidence on its own (such as
+    t3filter.time_filter) to data, one chunk at a time for a VirtualArray
+    '''
+    if not(isinstance(data, VirtualArray)):
+        return function(np.asarray(data), *args)
+    parts = [function(chunk, *args) for chunk in data.chunks()]
+    parts = [part for part in parts if part.shape[2] > 0]
+    if len(parts) == 0:
+        return np.zeros(data.shape[:2] + (0,), dtype=data.dtype)
+    return np.concatenate(parts, axis=2)
+
+def time_differences(data:np.ndarray) -> np.ndarray:
+    # signal - idler time of every coincidence
+    if hasattr(data, 'time_differences'):
+        return data.time_differences()
+    return data[1,2,:] - data[0,2,:]
+
+class TimeIndex:
+    '''
+    The signal - idler time differences of a dataset, sorted once along with
+    the permutation which sorts them. The coincidences in any time window
+    are then found with two binary searches instead of a pass over all of
+    the data.
+
+    # Parameters
+    data:np.ndarray
+        The (2, k, N) coincidences to index, e.g. a CoincidenceArray
+    '''
+    def __init__(self, data:np.ndarray):
+        self.data = data
+        dt = time_differences(data)
+        self.order = np.argsort(dt, kind='stable')
+        self.dt = dt[self.order]
+
+    def window(self, tmin:float, tmax:float) -> slice:
+        # of the sorted order, for tmin <= dt <= tmax
+        return slice(int(np.searchsorted(self.dt, tmin, side='left')), \
+                     int(np.searchsorted(self.dt, tmax, side='right')))
+
+    def indices(self, tmin:float, tmax:float) -> np.ndarray:
+        # of the coincidences in the window, in their original order
+        return np.sort(self.order[self.window(tmin, tmax)])
+
+def time_histogram(data:np.ndarray|VirtualArray, \
+                   edges:np.ndarray) -> np.ndarray:
+    # counts of signal - idler arrival time differences
+    chunks = data.chunks() if isinstance(data, VirtualArray) else [data]
+    counts = np.zeros(len(edges) - 1, dtype=np.int64)
+    for chunk in chunks:
+        if chunk.ndim == 3:
+            counts += np.histogram(time_differences(chunk), bins=edges)[0]
+    return counts
+
+@contextmanager
+def replace_when_done(file_name:str):
+    # writes to a temporary file which only replaces file_name once complete
+    temp = f'{file_name}.{os.getpid()}.tmp'
+    try:
+        with open(temp, 'wb') as f:
+            yield f
+        os.replace(temp, file_name)
+    except BaseException:
+        try:
+            os.remove(temp)
+        except FileNotFoundError:
+            pass
+        raise
+
+def iter_row(data:np.ndarray|VirtualArray, i:int, j:int, block:int):
+    # row (i, j) of data in pieces of at most block coincidences
+    rows = [array[i,j,:] for array in data.arrays] \
+        if isinstance(data, VirtualArray) else [data[i,j,:]]
+    for row in rows:
+        for start in range(0, row.shape[0], block):
+            yield np.ascontiguousarray(row[start:start + block], \
+                                       dtype=data.dtype)
+
+def save_npy(file_name:str, data:np.ndarray|VirtualArray, \
+             progress:Progress|None=None, token:CancelToken|None=None):
+    '''
+    np.save, but written one piece of each row at a time. A VirtualArray is
+    never loaded, a CoincidenceArray is only expanded one row at a time, and
+    the file is only replaced once it is complete.
+    '''
+    if not(file_name.endswith('.npy')):
+        file_name = file_name + '.npy'
+    dtype = np.dtype(data.dtype)
+    header = {'descr': np.lib.format.dtype_to_descr(dtype),
+              'fortran_order': False,
+              'shape': tuple(data.shape)}
+    if progress is not None:
+        progress.begin(int(np.prod(data.shape)) * dtype.itemsize, 'Exporting')
+    with replace_when_done(file_name) as f:
+        np.lib.format.write_array_header_1_0(f, header)
+        for i in range(data.shape[0]):
+            for j in range(data.shape[1]):
+                for row in iter_row(data, i, j, 2**22):
+                    if token is not None:
+                        token.check()
+                    f.write(row.data)
+                    if progress is not None:
+                        progress.advance(row.nbytes)
+
+# The .t3c format: compressed coincidences along with the settings which
+# produced them. The file is laid out as
+#   b'T3C1', u32 length, JSON header (settings, shape, dtype, chunk size)
+#   chunk, chunk, ... each column of each chunk zlib compressed on its own
+#   JSON index of the chunks, u64 offset of the index
+# all little endian. Every chunk records the range of idler times in it, so
+# that a time range can be read without decompressing the rest of the file.
+T3C_MAGIC = b'T3C1'
+
+def iter_chunks(data:np.ndarray|VirtualArray, chunk_size:int):
+    # in memory (2, k, <=chunk_size) pieces of data, in order
+    arrays = data.arrays if isinstance(data, VirtualArray) else \
+        [np.asarray(data)]
+    for array in arrays:
+        for start in range(0, array.shape[2], chunk_size):
+            yield np.array(array[:,:,start:start + chunk_size], \
+                           dtype=data.dtype)
+
+def encode_column(chunk:np.ndarray, i:int, j:int) -> tuple[dict,np.ndarray]:
+    '''
+    Picks the smallest exact encoding of row (i, j) of a chunk. Idler times
+    are stored as differences from the previous one, signal times as
+    differences from their idler time, and everything else as it is.
+    '''
+    column = chunk[i,j,:]
+    entry = {'encoding': 'raw'}
+    if j == 2 and column.size > 0:
+        if i == 0:
+            (entry, encoded) = ({'encoding': 'delta', \
+                                 'first': column[0].item()}, \
+                                narrow(np.diff(column)))
+        else:
+            (entry, encoded) = ({'encoding': 'relative'}, \
+                                narrow(column - chunk[0,2,:]))
+        entry['dtype'] = encoded.dtype.str
+        if np.array_equal(decode_column(entry, encoded, chunk[0,2,:], \
+                                        chunk.dtype), column):
+            return (entry, encoded)
+        entry = {'encoding': 'raw'}
+    encoded = narrow(column)
+    entry['dtype'] = encoded.dtype.str
+    return (entry, encoded)
+
+def decode_column(entry:dict, encoded:np.ndarray, idler_time:np.ndarray, \
+                  dtype:np.dtype) -> np.ndarray:
+    encoded = encoded.astype(dtype)
+    if entry['encoding'] == 'delta':
+        column = np.empty(encoded.size + 1, dtype=dtype)
+        column[0] = entry['first']
+        np.cumsum(encoded, out=column[1:])
+        column[1:] += column[0]
+        return column
+    if entry['encoding'] == 'relative':
+        return idler_time + encoded
+    return encoded
+
+def save_t3c(file_name:str, data:np.ndarray|VirtualArray, metadata:dict, \
+             chunk_size:int=2**20, level:int=6, \
+             progress:Progress|None=None, token:CancelToken|None=None):
+    '''
+    Writes (2, k, N) coincidences to a .t3c file.
+
+    # Parameters
+    file_name:str
+        The file to write
+    data:np.ndarray|VirtualArray
+        The coincidences, anything which np.asarray accepts
+    metadata:dict
+        Stored in the header as it is, e.g. the settings and beams which
+        produced the data. Must be JSON serializable.
+    chunk_size:int
+        Optional. Number of coincidences per chunk
+    level:int
+        Optional. zlib compression level
+    progress:Progress|None
+        Optional. Advanced by the uncompressed size of each chunk
+    token:CancelToken|None
+        Optional. Checked between chunks, the file is left as it was if the
+        export is cancelled
+    '''
+    header = {'shape': list(data.shape), 'dtype': np.dtype(data.dtype).str,
+              'chunk_size': chunk_size, 'metadata': metadata}
+    header_bytes = json.dumps(header).encode()
+    chunks = []
+    if progress is not None:
+        progress.begin(int(np.prod(data.shape)) * \
+                       np.dtype(data.dtype).itemsize, 'Exporting')
+    with replace_when_done(file_name) as f:
+        f.write(T3C_MAGIC)
+        f.write(struct.pack('<I', len(header_bytes)))
+        f.write(header_bytes)
+        for chunk in iter_chunks(data, chunk_size):
+            if token is not None:
+                token.check()
+            entry = {'count': chunk.shape[2],
+                     'tmin': chunk[0,2,:].min().item(),
+                     'tmax': chunk[0,2,:].max().item(),
+                     'columns': []}
+            for i in range(chunk.shape[0]):
+                for j in range(chunk.shape[1]):
+                    (column, encoded) = encode_column(chunk, i, j)
+                    blob = zlib.compress(encoded.tobytes(), level)
+                    column['offset'] = f.tell()
+                    column['length'] = len(blob)
+                    f.write(blob)
+                    entry['columns'].append(column)
+            chunks.append(entry)
+            if progress is not None:
+                progress.advance(chunk.nbytes)
+        index_offset = f.tell()
+        f.write(json.dumps(chunks).encode())
+        f.write(struct.pack('<Q', index_offset))
+
+def read_t3c_header(file_name:str) -> tuple[dict,list[dict]]:
+    '''
+    Reads the header and chunk index of a .t3c file without reading any
+    coincidences. The header holds 'shape', 'dtype', 'chunk_size' and the
+    'metadata' it was saved with.
+    '''
+    with open(file_name, 'rb') as f:
+        if f.read(4) != T3C_MAGIC:
+            raise ValueError(f'"{file_name}" is not a .t3c file')
+        (length,) = struct.unpack('<I', f.read(4))
+        header = json.loads(f.read(length))
+        f.seek(-8, os.SEEK_END)
+        (index_offset,) = struct.unpack('<Q', f.read(8))
+        index_length = f.tell() - 8 - index_offset
+        f.seek(index_offset)
+        chunks = json.loads(f.read(index_length))
+    return (header, chunks)
+
+def iter_t3c(file_name:str, tmin:float|None=None, tmax:float|None=None, \
+             progress:Progress|None=None, token:CancelToken|None=None):
+    '''
+    Yields the chunks of a .t3c file one at a time as (2, k, n) arrays,
+    optionally only the coincidences whose idler time is in [tmin, tmax].
+    Chunks entirely outside of that range are skipped without being read.
+    progress is advanced by the compressed size of every chunk.
+    '''
+    (header, chunks) = read_t3c_header(file_name)
+    dtype = np.dtype(header['dtype'])
+    cols = header['shape'][1]
+    lo = -np.inf if tmin is None else tmin
+    hi = np.inf if tmax is None else tmax
+    with open(file_name, 'rb') as f:
+        for entry in chunks:
+            if token is not None:
+                token.check()
+            if progress is not None:
+                progress.advance(sum(column['length'] \
+                                     for column in entry['columns']))
+            if entry['tmax'] < lo or entry['tmin'] > hi:
+                continue
+            chunk = np.empty(tuple(header['shape'][:2]) + (entry['count'],), \
+                             dtype=dtype)
+            for (n, column) in enumerate(entry['columns']):
+                (i, j) = divmod(n, cols)
+                f.seek(column['offset'])
+                encoded = np.frombuffer(zlib.decompress(\
+                    f.read(column['length'])), dtype=column['dtype'])
+                chunk[i,j,:] = decode_column(column, encoded, chunk[0,2,:], \
+                                             dtype)
+            if tmin is not None or tmax is not None:
+                chunk = chunk[:,:,(chunk[0,2,:] >= lo) & (chunk[0,2,:] <= hi)]
+            yield chunk
+
+def join_chunks(parts:list[np.ndarray], shape:tuple, dtype) -> np.ndarray:
+    parts = [part for part in parts if part.shape[2] > 0]
+    if len(parts) == 0:
+        return np.zeros(tuple(shape[:2]) + (0,), dtype=dtype)
+    return np.concatenate(parts, axis=2)
+
+def load_t3c(file_name:str, tmin:float|None=None, \
+             tmax:float|None=None) -> tuple[np.ndarray,dict]:
+    '''
+    Reads a .t3c file, optionally only the coincidences whose idler time is
+    in [tmin, tmax]. Chunks entirely outside of that range are skipped.
+
+    # Returns
+    (data, header) with data the (2, k, N) coincidences
+    '''
+    (header, _) = read_t3c_header(file_name)
+    parts = list(iter_t3c(file_name, tmin, tmax))
+    return (join_chunks(parts, header['shape'], header['dtype']), header)
+
+def time_extent(file_name:str) -> tuple[float,float]:
+    '''
+    First and last idler time in a .npy or .t3c file. A .t3c file only needs
+    its index, a .npy only has its idler times read.
+    '''
+    if file_name.endswith('.t3c'):
+        (_, chunks) = read_t3c_header(file_name)
+        chunks = [entry for entry in chunks if entry['count'] > 0]
+        if len(chunks) == 0:
+            return (np.inf, -np.inf)
+        return (min(entry['tmin'] for entry in chunks), \
+                max(entry['tmax'] for entry in chunks))
+    times = np.load(file_name, mmap_mode='r')[0,2,:]
+    if times.size == 0:
+        return (np.inf, -np.inf)
+    return (float(times.min()), float(times.max()))
+
+def load_partial(file_names:list[str], start:float|None=None, \
+                 stop:float|None=None, roi:tuple|None=None, join:bool=True, \
+                 progress:Progress|None=None, \
+                 token:CancelToken|None=None) -> np.ndarray|list[np.ndarray]:
+    '''
+    Loads only the coincidences of .npy or .t3c files within a time window
+    and region of interest, scanning the files one chunk at a time so that
+    only the matching coincidences are ever held in memory at once.
+
+    # Parameters
+    file_names:list[str]
+        The files to read, in order
+    start:float|None, stop:float|None
+        Optional. The time window in seconds since the first idler time of
+        all files. Negative values count back from the last one instead, so
+        start=-600 is the last ten minutes.
+    roi:tuple|None
+        Optional. (xmin, xmax, ymin, ymax) in pixels, inclusive, with None
+        for no limit. A coincidence is kept if either of its photons is in it.
+    join:bool
+        Optional. If False the matches of each file are returned separately
+    progress:Progress|None
+        Optional. Advanced by the bytes of each chunk as it is scanned
+    token:CancelToken|None
+        Optional. Checked between chunks
+
+    # Returns
+    The matching (2, k, N) coincidences, or a list of them per file
+    '''
+    (tmin, tmax) = (None, None)
+    if start is not None or stop is not None:
+        extents = [time_extent(file_name) for file_name in file_names]
+        first = min(lo for (lo, _) in extents)
+        last = max(hi for (_, hi) in extents)
+        to_ns = lambda s: (first if s >= 0 else last) + s * 1e9
+        tmin = None if start is None else to_ns(start)
+        tmax = None if stop is None else to_ns(stop)
+    if roi is not None:
+        roi = tuple(default if lim is None else lim for (lim, default) in \
+                    zip(roi, (-np.inf, np.inf, -np.inf, np.inf)))
+
+    def matching(chunk:np.ndarray) -> np.ndarray:
+        keep = np.ones(chunk.shape[2], dtype=bool)
+        if tmin is not None:
+            keep &= chunk[0,2,:] >= tmin
+        if tmax is not None:
+            keep &= chunk[0,2,:] <= tmax
+        if roi is not None:
+            inside = [(chunk[i,0,:] >= roi[0]) & (chunk[i,0,:] <= roi[1]) & \
+                      (chunk[i,1,:] >= roi[2]) & (chunk[i,1,:] <= roi[3]) \
+                      for i in range(chunk.shape[0])]
+            keep &= np.logical_or.reduce(inside)
+        return chunk[:,:,keep]
+
+    if progress is not None:
+        progress.begin(sum(os.stat(file_name).st_size \
+                           for file_name in file_names), \
+                       f'Scanning {len(file_names)} file(s)')
+    runs = []
+    for file_name in file_names:
+        parts = []
+        if file_name.endswith('.t3c'):
+            (header, _) = read_t3c_header(file_name)
+            (shape, dtype) = (header['shape'], np.dtype(header['dtype']))
+            for chunk in iter_t3c(file_name, tmin, tmax, progress, token):
+                parts.append(matching(chunk))
+        else:
+            data = VirtualArray([file_name])
+            (shape, dtype) = (data.shape, data.dtype)
+            for chunk in data.chunks():
+                if token is not None:
+                    token.check()
+                parts.append(matching(chunk))
+                if progress is not None:
+                    progress.advance(chunk.nbytes)
+        runs.append(join_chunks(parts, shape, dtype))
+    if not(join):
+        return runs
+    return join_chunks(runs, runs[0].shape, np.result_type(*runs))
+
+def is_time_sorted(run:np.ndarray) -> bool:
+    # by signal time, read one row at a time for memory mapped runs
+    times = run[1,2,:]
+    return bool(np.all(times[1:] >= times[:-1]))
+
+def merge_runs(runs:list[np.ndarray], dedupe:bool=False, block:int=2**20, \
+               progress:Progress|None=None, \
+               token:CancelToken|None=None) -> np.ndarray:
+    '''
+    Merges (2, k, n) runs of coincidences into one array sorted by signal
+    time, without sorting the whole result. Each run is sorted on its own if
+    it is not already, then blocks of every run are merged so that only
+    about len(runs)*block coincidences are being sorted at any one time.
+
+    # Parameters
+    runs:list[np.ndarray]
+        The runs to merge, e.g. memory mapped .npy files
+    dedupe:bool
+        Optional. Drop coincidences which are exactly equal to another one
+    block:int
+        Optional. Number of coincidences taken from each run at once
+    progress:Progress|None
+        Optional. Advanced by the bytes of each merged block
+    token:CancelToken|None
+        Optional. Checked between blocks
+
+    # Returns
+    The merged (2, k, N) coincidences
+    '''
+    dtype = np.result_type(*runs)
+    if progress is not None:
+        progress.begin(sum(run.nbytes for run in runs), \
+                       f'Merging {len(runs)} run(s)')
+    runs = [run if is_time_sorted(run) else \
+            np.asarray(run)[:,:,np.argsort(run[1,2,:], kind='stable')] \
+            for run in runs]
+    out = np.empty(runs[0].shape[:2] + (sum(run.shape[2] for run in runs),), \
+                   dtype=dtype)
+    positions = [0] * len(runs)
+    size = 0
+    (last_time, last_rows) = (None, set())
+    while any(p < run.shape[2] for (p, run) in zip(positions, runs)):
+        if token is not None:
+            token.check()
+        blocks = [run[:,:,p:p + block] for (p, run) in zip(positions, runs)]
+        # everything up to the end of the shortest reaching block is final
+        bounds = [b[1,2,-1] for (p, b, run) in zip(positions, blocks, runs) \
+                  if p + block < run.shape[2]]
+        cutoff = min(bounds) if len(bounds) > 0 else np.inf
+        takes = [int(np.searchsorted(b[1,2,:], cutoff, side='right')) \
+                 for b in blocks]
+        batch = np.concatenate([np.asarray(b[:,:,:take], dtype=dtype) \
+                                for (b, take) in zip(blocks, takes)], axis=2)
+        positions = [p + take for (p, take) in zip(positions, takes)]
+
+        if dedupe:
+            # equal coincidences end up next to each other
+            # (lexsort sorts by its last key, the signal time, first)
+            keys = [batch[i,j,:] for i in range(batch.shape[0]) \
+                    for j in range(batch.shape[1])]
+            batch = batch[:,:,np.lexsort(keys)]
+            keep = np.ones(batch.shape[2], dtype=bool)
+            keep[1:] = np.any(batch[:,:,1:] != batch[:,:,:-1], axis=(0,1))
+            # and with those of the same time in the batch before
+            for n in np.flatnonzero(batch[1,2,:] == last_time):
+                keep[n] &= tuple(batch[:,:,n].ravel()) not in last_rows
+            batch = batch[:,:,keep]
+            if batch.shape[2] > 0:
+                tail = batch[:,:,batch[1,2,:] == batch[1,2,-1]]
+                rows = {tuple(tail[:,:,n].ravel()) for n in range(tail.shape[2])}
+                if batch[1,2,-1] == last_time:
+                    last_rows |= rows
+                else:
+                    (last_time, last_rows) = (batch[1,2,-1], rows)
+        else:
+            batch = batch[:,:,np.argsort(batch[1,2,:], kind='stable')]
+
+        out[:,:,size:size + batch.shape[2]] = batch
+        size += batch.shape[2]
+        if progress is not None:
+            progress.advance(sum(takes) * batch.itemsize * \
+                             batch.shape[0] * batch.shape[1])
+    return out[:,:,:size]
+
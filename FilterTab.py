@@ -125,9 +125,10 @@ class FilterTab(ctk.CTkFrame):
         self.dir = tk.StringVar(self,
                                 os.path.dirname(os.path.realpath(__file__)))
         self.ref_image = ReferenceImage(errors=self.errors)
+        self.chain = FilterChain(self.raw_data)
 
         # add sub-tabs
-        self.tabs = ctk.CTkTabview(self)
+        self.tabs = ctk.CTkTabview(self, command=self.tab_changed)
         self.tabs.add("Time")
         self.tabs.add("Space")
         self.left_align_tabs()
@@ -138,6 +139,7 @@ class FilterTab(ctk.CTkFrame):
                                raw_data=self.raw_data,
                                filtered_data=self.filtered_data,
                                filtered_data_updates=self.filtered_data_updates,
+                               chain=self.chain,
                                ref_image=self.ref_image,
                                dir=self.dir)
         self.spacetab = SpaceTab(master=self.tabs.tab("Space"),
@@ -145,8 +147,17 @@ class FilterTab(ctk.CTkFrame):
                                  filtered_data=self.filtered_data,
                                  filtered_data_updates=\
                                     self.filtered_data_updates,
+                                 chain=self.chain,
+                                 time_window=self.timetab.time_window,
                                  ref_image=self.ref_image,
                                  dir=self.dir)
+        self.chain.append('time', self.timetab.time_filter)
+        self.chain.append('bin', self.spacetab.bin)
+        self.chain.append('space', self.spacetab.space_filter)
+        # a lambda rather than a method of this tab, so that it also runs
+        # while the tab is hidden (see CanvasList.visible)
+        self.raw_data_updates.append([lambda data: self.raw_data_changed()], \
+            extend_functions=[lambda new: self.raw_data_changed()])
 
         # layout tabs
         self.timetab.pack(padx=0,pady=0,anchor='center',expand=True,fill='both')
@@ -154,6 +165,16 @@ class FilterTab(ctk.CTkFrame):
                            anchor='center',expand=True,fill='both')
         self.tabs.pack(padx=5, pady=0, anchor='center', expand=True,fill='both')
 
+    def raw_data_changed(self):
+        # whatever was derived from the previous raw data is let go of now
+        self.chain.invalidate()
+        self.timetab.time_index = None
+
+    def tab_changed(self):
+        # once the new tab is laid out, draw what changed while it was hidden
+        self.after_idle(self.raw_data_updates.update_dirty)
+        self.after_idle(self.filtered_data_updates.update_dirty)
+
     def left_align_tabs(self):
         self.tabs._segmented_button.grid(row=1, 
                                          rowspan=2, 
@@ -202,19 +223,14 @@ class PreviewCanvas(SubplotCanvas):
         super().__init__(*args, **kwargs)
 
         self.ref_image = ref_image
+        self.label_axes("$X$ (pixels)", "$Y$ (pixels)", \
+                        "$X$ (pixels)", "$Y$ (pixels)")
 
         filtered_data_updates.append([self.update_plot])
 
     def update_plot(self, data):
-        self.ax_1.clear()
-        self.ax_2.clear()
-        self.ax_1.set_xlabel("$X$ (pixels)")
-        self.ax_1.set_ylabel("$Y$ (pixels)")
-        self.ax_2.set_xlabel("$X$ (pixels)")
-        self.ax_2.set_ylabel("$Y$ (pixels)")
-
-        (_,direct,ghost) = t3view.plot_coincidences(data.get(), 
-                                                    fig=self.figure)
+        (ghost,direct) = view_cache.get(data, coincidence_images)
+        self.show_images(ghost, direct)
 
         if self.ref_image.ref.get().size != 0:
             fidelities = self.ref_image.calc_fidelities(direct,ghost)
@@ -350,6 +366,7 @@ class TimeTab(ctk.CTkFrame):
     def __init__(self, *args, raw_data:ReferentialNpArray, 
                  filtered_data:ReferentialNpArray,
                  filtered_data_updates:CanvasList,
+                 chain:FilterChain,
                  ref_image:ReferenceImage, 
                  dir:tk.StringVar, **kwargs):
         super().__init__(*args, **kwargs)
@@ -358,6 +375,7 @@ class TimeTab(ctk.CTkFrame):
         self.raw_data = raw_data
         self.filtered_data = filtered_data
         self.filtered_data_updates = filtered_data_updates
+        self.chain = chain
         self.ref_image = ref_image
         self.dir = dir
         self.min_bin = tk.IntVar(self,-200)
@@ -365,6 +383,10 @@ class TimeTab(ctk.CTkFrame):
         self.num_bin = tk.IntVar(self,44)
         self.fmin = tk.IntVar(self,-200)
         self.fmax = tk.IntVar(self,200)
+        self.hist_edges = np.zeros(0)
+        self.hist_counts = np.zeros(0, dtype=np.int64)
+        self.hist_bars = None
+        self.time_index = None
 
         # define widgets
         self.preview = PreviewCanvas(master=self,
@@ -391,6 +413,8 @@ class TimeTab(ctk.CTkFrame):
                                          min_bin=self.min_bin,
                                          max_bin=self.max_bin,
                                          title='Time of Arrival Differences')
+        self.histogram.ax.set_xlabel('Signal - Idler (ns)')
+        self.histogram.ax.set_ylabel('Counts')
         self.timeInfo = TimeInfo(master=self, 
                                  raw_data = self.raw_data,
                                  filtered_data = self.filtered_data, 
@@ -407,7 +431,9 @@ class TimeTab(ctk.CTkFrame):
                                  label_text="Time Statistics")
         
         # modify widgets
-        self.filtered_data_updates.append([self.update_histogram])
+        self.filtered_data_updates.append([self.update_histogram], \
+                                          extend_functions=\
+                                            [self.extend_histogram])
 
         # layout
         self.columnconfigure(2,weight=1)
@@ -418,15 +444,42 @@ class TimeTab(ctk.CTkFrame):
         self.ref.grid(row=1,column=2,padx=(3,5),pady=(0,5),sticky='ew')
     
     def update_histogram(self, data):
-        self.histogram.ax.clear()
-        t3view.plot_histogram(data.get(), 
-                              min_bin=self.min_bin.get(),
-                              max_bin=self.max_bin.get(),
-                              fig = self.histogram.figure)
+        # binned here rather than by t3view so that new data can be added on
+        edges = np.linspace(self.min_bin.get(), self.max_bin.get(),
+                            max(1, self.num_bin.get()) + 1)
+        self.hist_counts = time_histogram(data.get(), edges)
+
+        ax = self.histogram.ax
+        if self.hist_bars is not None and np.array_equal(edges, \
+                                                         self.hist_edges):
+            # same bins, so only the heights change
+            for (bar, height) in zip(self.hist_bars, self.hist_counts):
+                bar.set_height(height)
+        else:
+            if self.hist_bars is not None:
+                self.hist_bars.remove()
+            self.hist_bars = ax.bar(edges[:-1], self.hist_counts,
+                                    width=np.diff(edges), align='edge')
+            # the data limits still include the removed bars
+            ax.set_xlim(edges[0], edges[-1])
+        self.hist_edges = edges
+        ax.set_ylim(0, max(1, self.hist_counts.max()) * 1.05)
         self.histogram.redraw()
         self.histogram.init_home()
 
-    def get_apply_filter(self):
+    def extend_histogram(self, new:np.ndarray):
+        if self.hist_bars is None:
+            self.update_histogram(self.filtered_data)
+            return
+        self.hist_counts = self.hist_counts + \
+            time_histogram(new, self.hist_edges)
+        for (bar, height) in zip(self.hist_bars, self.hist_counts):
+            bar.set_height(height)
+        self.histogram.ax.set_ylim(0, max(1, self.hist_counts.max()) * 1.05)
+        self.histogram.redraw()
+
+    def time_window(self) -> tuple[int,int]:
+        # the clicked window if there is one, otherwise the last one used
         (tmin, tmax) = self.histogram.get_clicks()
         self.histogram.clickx = None
         self.histogram.prevclickx = None
@@ -436,12 +489,25 @@ class TimeTab(ctk.CTkFrame):
         else:
             self.fmin.set(tmin)
             self.fmax.set(tmax)
+        return (tmin, tmax)
 
-        data = t3filter.time_filter(self.raw_data.get(),tmin,tmax)
-
-        self.filtered_data.set(data)
+    def get_apply_filter(self):
+        self.chain.set('time', *self.time_window())
+        self.chain.clear('bin', 'space')
+        self.filtered_data.set(self.chain.run())
         self.filtered_data_updates.update_all()
 
+    def time_filter(self, raw:np.ndarray, tmin:float, \
+                    tmax:float) -> np.ndarray:
+        if isinstance(raw, VirtualArray):
+            # too big to index, scanned chunk by chunk instead
+            return CoincidenceArray(filter_chunked(t3filter.time_filter, raw, \
+                                                   tmin, tmax))
+        if self.time_index is None or self.time_index.data is not raw:
+            self.time_index = TimeIndex(raw) # once per dataset
+        # a view of raw_data, nothing is copied
+        return FilteredView(raw, self.time_index.indices(tmin, tmax))
+
     def recall(self, recall:RecallFile):
         self.fmin.set(recall.parameters['fmin']) #type:ignore
         self.fmax.set(recall.parameters['fmax']) #type:ignore
@@ -451,7 +517,8 @@ class TimeTab(ctk.CTkFrame):
         new_params['fmax'] = self.fmax.get()
 
     def reset(self):
-        self.filtered_data.set(self.raw_data.get())
+        self.chain.clear()
+        self.filtered_data.set(self.chain.run())
         self.filtered_data_updates.update_all()
 
 class TimeInfo(LabeledFrame):
@@ -473,8 +540,6 @@ class TimeInfo(LabeledFrame):
         self.filtered_data = filtered_data
         self.tot_counts = tk.IntVar(self, value=0)
         self.filtered_counts = tk.IntVar(self, value=0)
-        self.dt_raw = np.zeros(0)
-        self.dt = np.zeros(0)
         self.min_bin = min_bin
         self.max_bin = max_bin
         self.num_bin = num_bin
@@ -483,7 +548,8 @@ class TimeInfo(LabeledFrame):
         self.hist_update = hist_update
         self.get_apply_filter = get_apply_filter
         
-        filtered_data_updates.append([self.update_info])
+        filtered_data_updates.append([self.update_info], \
+                                     extend_functions=[self.extend_info])
 
         # init widgets
         f = self.get_frame()
@@ -551,24 +617,26 @@ class TimeInfo(LabeledFrame):
                                 padx=(0,5),pady=(0,5),sticky='ew')
 
     def update_info_from_button(self):
-        self.dt_raw = self.raw_data.get()[1,2,:] - self.raw_data.get()[0,2,:]
-        self.dt = self.filtered_data.get()[1,2,:] - \
-            self.filtered_data.get()[0,2,:]
         self.hist_update(data=self.filtered_data)
 
     def update_info(self,data):
-        self.dt_raw = self.raw_data.get()[1,2,:] - self.raw_data.get()[0,2,:]
-        self.tot_counts.set(self.dt_raw.size)
-        self.dt = self.filtered_data.get()[1,2,:] - \
-            self.filtered_data.get()[0,2,:]
-        self.filtered_counts.set(self.dt.size)
+        # counted from the shape so that imported data is never loaded here
+        self.tot_counts.set(self.raw_data.get().shape[-1])
+        self.filtered_counts.set(self.filtered_data.get().shape[-1])
         self.hist_update(data)
+
+    def extend_info(self, new:np.ndarray):
+        # only the counts, the histogram extends itself
+        self.tot_counts.set(self.tot_counts.get() + new.shape[2])
+        self.filtered_counts.set(self.filtered_counts.get() + new.shape[2])
         
 
 class SpaceTab(ctk.CTkFrame):
     def __init__(self, *args, raw_data:ReferentialNpArray, 
                  filtered_data:ReferentialNpArray, 
                  filtered_data_updates:CanvasList, 
+                 chain:FilterChain,
+                 time_window:Callable,
                  ref_image:ReferenceImage, 
                  dir:tk.StringVar, **kwargs):
         super().__init__(*args, **kwargs)
@@ -577,6 +645,8 @@ class SpaceTab(ctk.CTkFrame):
         self.raw_data = raw_data
         self.filtered_data = filtered_data
         self.filtered_data_updates = filtered_data_updates
+        self.chain = chain
+        self.time_window = time_window
         self.ref_image = ref_image
         self.dir = dir
         self.threshold = tk.DoubleVar(self, 0.2)
@@ -607,6 +677,8 @@ class SpaceTab(ctk.CTkFrame):
                                           label_text='X-Y Correlations', 
                                           axis_1_label='X Correlations', 
                                           axis_2_label='Y Correlations')
+        self.correlations.label_axes("$X_i$ (pixels)", "$X_s$ (pixels)", \
+                                     "$Y_i$ (pixels)", "$Y_s$ (pixels)")
         self.space_info = SpaceInfo(master=self, 
                                     label_text='Space Filter Control', 
                                     raw_data=self.raw_data,
@@ -631,46 +703,52 @@ class SpaceTab(ctk.CTkFrame):
         self.ref.grid(row=1,column=2,padx=(3,5),pady=(0,5),sticky='ew')
 
     def update_correlations(self, data):
-        self.correlations.ax_1.clear()
-        self.correlations.ax_2.clear()
-        self.correlations.ax_1.set_xlabel("$X_i$ (pixels)")
-        self.correlations.ax_1.set_ylabel("$X_s$ (pixels)")
-        self.correlations.ax_2.set_xlabel("$Y_i$ (pixels)")
-        self.correlations.ax_2.set_ylabel("$Y_s$ (pixels)")
-
-        t3view.plot_correlations(data.get(), fig=self.correlations.figure)
+        self.correlations.show_images(*view_cache.get(data, \
+                                                      correlation_images))
         self.correlations.redraw()
         self.correlations.init_home()
 
     def get_apply_filter(self,alt=False):
-        self.reset() # adds a bit of overhead. Remove this if it gets too slow
-        self.update_binning()
-
-        if alt:
-            (data,_) = t3filter.space_filter_alt(self.filtered_data.get(), 
-                                             self.threshold.get())
-        else:
-            data = t3filter.space_filter(self.filtered_data.get(), 
-                                         self.threshold.get())
-
-        self.filtered_data.set(data)
+        # earlier stages are only redone if their settings changed
+        self.chain.set('time', *self.time_window())
+        self.set_binning()
+        self.chain.set('space', self.threshold.get(), alt)
+        self.filtered_data.set(self.chain.run())
         self.filtered_data_updates.update_all()
 
     def update_binning(self):
-        bin_data = t3filter.bin(self.filtered_data.get(), \
-                                self.space_info.xbinsize.get(), \
-                                self.space_info.ybinsize.get())
+        self.chain.set('time', *self.time_window())
+        self.set_binning()
+        self.chain.clear('space')
+        self.filtered_data.set(self.chain.run())
+        self.filtered_data_updates.update_all()
+
+    def set_binning(self):
         self.current_xbin = self.space_info.xbinsize.get()
         self.current_ybin = self.space_info.ybinsize.get()
-        self.filtered_data.set(bin_data)
-        self.filtered_data_updates.update_all()
+        self.chain.set('bin', self.current_xbin, self.current_ybin)
 
     def reset(self):
-        # this is an ugly reference but it's the way that requires the least 
-        # amount of work to do the filter reset so this is what you get
-        self.master.master.master.timetab.get_apply_filter()
+        self.chain.set('time', *self.time_window())
+        self.chain.clear('bin', 'space')
         self.current_xbin = 1
         self.current_ybin = 1
+        self.filtered_data.set(self.chain.run())
+        self.filtered_data_updates.update_all()
+
+    @staticmethod
+    def bin(data:np.ndarray, xbin:int, ybin:int) -> np.ndarray:
+        if xbin == 1 and ybin == 1:
+            return data # nothing to bin, so the view is kept instead of copied
+        return t3filter.bin(np.asarray(data), xbin, ybin)
+
+    @staticmethod
+    def space_filter(data:np.ndarray, threshold:float, \
+                     alt:bool) -> np.ndarray:
+        if alt:
+            (data,_) = t3filter.space_filter_alt(np.asarray(data), threshold)
+            return data
+        return t3filter.space_filter(np.asarray(data), threshold)
 
 
 class SpaceInfo(LabeledFrame):
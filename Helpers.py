@@ -1,127 +1,448 @@
 import os
-import csv
 import numpy as np
-from threading import Thread
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, Future
 
 import tpx3_toolkit as t3
+import tpx3_toolkit.viewer as t3view
 from CustomTKWidgets import *
+from Pipeline import *
+from DataIO import *
 
 class ReferentialNpArray:
     def __init__(self, array:np.ndarray=np.array([])):
         self.array = array
+        self.generation = 0 # counts set() calls, for caches of derived data
 
     def set(self,array:np.ndarray):
         self.array = array
+        self.generation += 1
     
     def get(self):
         return self.array
 
-class ReturnThread(Thread):
-    def __init__(self, target, args:tuple):
-        Thread.__init__(self)
-        self.target = target
-        self.args = args
-        self.ret = None
+class ViewCache:
+    '''
+    Views derived from the data of a ReferentialNpArray (e.g. 2D histograms),
+    kept until the data is next set. Canvases showing the same view of the
+    same data then share one computation per data change.
+    '''
+    def __init__(self):
+        self.views = {}
 
-    def run(self):
-        self.ret = self.target(*self.args)
-        self.angle = None
-    def get(self):
-        return self.ret
+    def get(self, data:ReferentialNpArray, compute:Callable, *params):
+        # compute(data.get(), *params) -> the view
+        (generation, views) = self.views.get(data, (None, {}))
+        if generation != data.generation:
+            views = {} # older generations are never asked for again
+            self.views[data] = (data.generation, views)
+        key = (compute,) + params
+        if key not in views:
+            views[key] = compute(data.get(), *params)
+        return views[key]
+
+view_cache = ViewCache()
+
+def coincidence_images(data:np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    # where the idler and signal photons of the coincidences hit, from only
+    # their x and y rows
+    if isinstance(data, VirtualArray):
+        data = view_of(data) # sampled once for both images
+    return (t3view._make_view(np.asarray(data[0,0:2,:]))[0], \
+            t3view._make_view(np.asarray(data[1,0:2,:]))[0])
+
+def correlation_images(data:np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    # X_i against X_s and Y_i against Y_s
+    if isinstance(data, VirtualArray):
+        data = view_of(data)
+    return (t3view._make_view(np.asarray(data[:,0,:]))[0], \
+            t3view._make_view(np.asarray(data[:,1,:]))[0])
+
+def coincidence_xy_image(data:np.ndarray) -> np.ndarray:
+    # where the signal photon hit relative to its idler, x against y
+    if isinstance(data, VirtualArray):
+        data = view_of(data)
+    return t3view._make_view(np.asarray(data[1,0:2,:]) - \
+                             np.asarray(data[0,0:2,:]))[0]
+
+class CoincidenceArray:
+    '''
+    Coincidences kept as one contiguous column per photon and quantity, each
+    in the narrowest dtype that holds it exactly. The signal time is stored
+    as its difference from the idler time when that is smaller.
+
+    It stands in for the usual (2, k, N) array: indexing a single column
+    returns just that column, and np.asarray gives back the full array in
+    its original dtype for the t3view and t3filter calls.
+
+    # Parameters
+    data:np.ndarray
+        The (2, k, N) coincidences to store, idler first, rows x, y, t
+    '''
+    def __init__(self, data:np.ndarray):
+        data = np.asarray(data)
+        if data.ndim != 3:
+            raise ValueError(f'Expected a (2, k, N) array, got {data.shape}')
+        self.dtype = data.dtype
+        self.shape = data.shape
+        self.ndim = 3
+        self.size = data.size
+        self.columns = [[narrow(data[i,j,:]) for j in range(data.shape[1])] \
+                        for i in range(data.shape[0])]
+
+        # the signal arrives within the coincidence window of the idler
+        self.delta = False
+        if data.shape[0] == 2 and data.shape[1] > 2:
+            dt = narrow(data[1,2,:] - data[0,2,:])
+            if dt.dtype.itemsize < self.columns[1][2].dtype.itemsize and \
+                np.array_equal(data[0,2,:] + dt.astype(self.dtype), \
+                               data[1,2,:]):
+                self.columns[1][2] = dt
+                self.delta = True
+        self.nbytes = sum(c.nbytes for row in self.columns for c in row)
+
+    def column(self, i:int, j:int, index=slice(None)) -> np.ndarray:
+        # indexed before widening, so only the selected values are copied
+        (i, j) = (range(self.shape[0])[i], range(self.shape[1])[j])
+        if self.delta and (i, j) == (1, 2):
+            return self.columns[0][2][index] + \
+                self.columns[1][2][index].astype(self.dtype)
+        return self.columns[i][j][index].astype(self.dtype)
+
+    def time_differences(self, index=slice(None)) -> np.ndarray:
+        # signal - idler time, without rebuilding the signal time
+        if self.delta:
+            return self.columns[1][2][index]
+        return self.column(1,2,index) - self.column(0,2,index)
+
+    def __getitem__(self, key):
+        if not isinstance(key, tuple):
+            key = (key,)
+        if any(k is Ellipsis or k is None for k in key) or len(key) > 3:
+            raise IndexError('A CoincidenceArray only takes up to three ' +\
+                             'indices, without ... or None')
+        key = key + (slice(None),) * (3 - len(key))
+        (rows, cols, rest) = key
+        if isinstance(rows, (int, np.integer)) and \
+            isinstance(cols, (int, np.integer)):
+            return self.column(rows, cols, rest)
+        rows = range(self.shape[0])[rows]
+        cols = range(self.shape[1])[cols]
+        if isinstance(rows, int):
+            return np.stack([self.column(rows, j, rest) for j in cols])
+        elif isinstance(cols, int):
+            return np.stack([self.column(i, cols, rest) for i in rows])
+        return np.stack([np.stack([self.column(i, j, rest) for j in cols]) \
+                         for i in rows])
+
+    def __array__(self, dtype=None, copy=None):
+        data = self[:,:,:]
+        return data if dtype is None else data.astype(dtype)
+
+class FilteredView:
+    '''
+    The coincidences of another dataset which passed a filter, held only as
+    their indices into it. The full array is only built the first time
+    something needs it as an array (np.asarray, e.g. the binning and space
+    filters after the time filter), and is then kept for as long as the view
+    is.
+
+    # Parameters
+    base:np.ndarray
+        The dataset being filtered, e.g. a CoincidenceArray or another view
+    indices:np.ndarray
+        The indices along the last axis of base which are kept, in order
+    '''
+    def __init__(self, base:np.ndarray, indices:np.ndarray):
+        if isinstance(base, FilteredView):
+            (base, indices) = (base.base, base.indices[indices])
+        self.base = base
+        self.indices = indices
+        self.dtype = base.dtype
+        self.shape = base.shape[:2] + (indices.shape[0],)
+        self.ndim = 3
+        self.size = int(np.prod(self.shape))
+        self.nbytes = indices.nbytes
+        self.dense = None
+
+    def time_differences(self) -> np.ndarray:
+        if hasattr(self.base, 'time_differences'):
+            return self.base.time_differences(self.indices)
+        return self.base[1,2,self.indices] - self.base[0,2,self.indices]
+
+    def __getitem__(self, key):
+        if self.dense is not None:
+            return self.dense[key]
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (3 - len(key))
+        return self.base[key[0], key[1], self.indices[key[2]]]
+
+    def __array__(self, dtype=None, copy=None):
+        if self.dense is None:
+            self.dense = np.asarray(self.base[:,:,self.indices])
+        return self.dense if dtype is None else self.dense.astype(dtype)
+
+class Job:
+    '''
+    A handle on a job submitted to a JobRunner. The job's target is given
+    progress and token keyword arguments which it is expected to report to and
+    check between chunks of work.
+    '''
+    def __init__(self):
+        self.progress = Progress()
+        self.token = CancelToken()
+        self.future = None
+
+    def cancel(self):
+        self.token.cancel()
+        if self.future is not None:
+            self.future.cancel() # in case it has not started yet
+
+    def running(self) -> bool:
+        return self.future is not None and not(self.future.done())
+
+class JobRunner:
+    '''
+    The one shared executor that all heavy background work of the app goes
+    through, which also caps how many of those jobs run at once. Completion is
+    handed back to the Tk main loop through callbacks instead of each caller
+    polling its own thread.
+
+    # Parameters
+    root:tk.Misc
+        Any widget of the app, used to get back onto the Tk thread
+    max_jobs:int
+        How many jobs may run at the same time. Any more are queued.
+    '''
+    def __init__(self, root:tk.Misc, max_jobs:int=2):
+        self.root = root
+        self.executor = ThreadPoolExecutor(max_workers=max_jobs)
+        self.jobs = set() # submitted and not finished yet
+        self.lock = Lock()
+
+    def submit(self, target:Callable, args:tuple=(), \
+               on_done:Callable=lambda result: None, \
+               on_error:Callable=lambda error: None, \
+               on_cancel:Callable=lambda: None) -> Job:
+        job = Job()
+        with self.lock:
+            self.jobs.add(job)
+        job.future = self.executor.submit(target, *args, \
+                                          progress=job.progress, \
+                                          token=job.token)
+        job.future.add_done_callback(\
+            lambda future: self.finished(job, future, on_done, on_error, \
+                                         on_cancel))
+        return job
+
+    def finished(self, job:Job, future:Future, on_done:Callable, \
+                 on_error:Callable, on_cancel:Callable):
+        # runs on the worker thread, after() hands the callback over to Tk
+        with self.lock:
+            self.jobs.discard(job)
+        if future.cancelled():
+            callback = on_cancel
+        elif isinstance(future.exception(), Cancelled):
+            callback = on_cancel
+        elif future.exception() is not None:
+            callback = lambda: on_error(future.exception())
+        else:
+            callback = lambda: on_done(future.result())
+        try:
+            self.root.after(0, callback)
+        except RuntimeError:
+            pass # the app has already been closed
+
+    def shutdown(self):
+        # the worker threads are joined at exit, so running jobs are asked
+        # to stop at their next check instead of being left to finish
+        with self.lock:
+            jobs = list(self.jobs)
+        for job in jobs:
+            job.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+class GrowableNpArray:
+    '''
+    A (2, k, N) array which can be appended to along N in amortized constant
+    time, by keeping spare room at the end of a larger buffer
+    '''
+    def __init__(self):
+        self.buffer = None
+        self.size = 0
+
+    def extend(self, new:np.ndarray):
+        if self.buffer is None:
+            self.buffer = np.empty(new.shape[:2] + (max(1024, 2*new.shape[2]),),
+                                   dtype=new.dtype)
+        elif self.size + new.shape[2] > self.buffer.shape[2]:
+            capacity = max(2*self.buffer.shape[2], self.size + new.shape[2])
+            buffer = np.empty(self.buffer.shape[:2] + (capacity,), \
+                              dtype=self.buffer.dtype)
+            buffer[:,:,:self.size] = self.buffer[:,:,:self.size]
+            self.buffer = buffer
+        self.buffer[:,:,self.size:self.size + new.shape[2]] = new
+        self.size += new.shape[2]
+
+    def get(self) -> np.ndarray:
+        if self.buffer is None:
+            return np.zeros((2,3,0))
+        return self.buffer[:,:,:self.size]
 
 class CanvasList:
+    '''
+    The functions which redraw everything that depends on a piece of data.
+    Each can optionally be paired with an extend function, which takes only
+    newly appended data and updates incrementally. update_all redraws
+    everything from scratch, while extend_all only runs the extend functions
+    (used while following a live acquisition).
+
+    Given a root, update_all only schedules the redraw for when Tk is next
+    idle, so any number of data changes made while handling one event are
+    drawn in a single pass. Functions which are methods of a widget that is
+    not on screen (e.g. in another tab) are then only marked dirty, and are
+    run by update_dirty once the widget is shown again.
+
+    # Parameters
+    data:ReferentialNpArray
+        The data which the functions draw
+    update_functions:list[Callable]|None
+        Functions called as function(data=data, **kwargs)
+    args:list|None
+        The kwargs of each update function
+    root:tk.Misc|None
+        Any widget of the app. Without one every update is done immediately.
+    '''
     def __init__(self, data:ReferentialNpArray, \
-                 update_functions:list[Callable]=[], args:list=[]):
+                 update_functions:list[Callable]|None=None, \
+                 args:list|None=None, root:tk.Misc|None=None):
+        # lists are copied so that instances never share them
         self.data = data
-        self.update_functions = update_functions
+        self.update_functions = list(update_functions or [])
+        self.extend_functions = [None for f in self.update_functions]
+        self.dirty = [False for f in self.update_functions]
+        self.root = root
+        self.pending = None
 
-        if len(self.update_functions) != len(args):
+        if args is None or len(self.update_functions) != len(args):
             self.args = [{} for i in range(len(self.update_functions))]
         else:
-            self.args = args
+            self.args = list(args)
 
-    def append(self, update_functions:list[Callable], args:list=[]):
+    def append(self, update_functions:list[Callable], args:list=[], \
+               extend_functions:list[Callable|None]=[]):
         self.update_functions.extend(update_functions)
+        self.dirty.extend([False for f in update_functions])
 
         if len(update_functions) != len(args):
             self.args.extend([{} for i in range(len(update_functions))])
         else:
             self.args.extend(args)
 
+        if len(update_functions) != len(extend_functions):
+            self.extend_functions.extend([None for f in update_functions])
+        else:
+            self.extend_functions.extend(extend_functions)
+
+    def visible(self, function:Callable) -> bool:
+        # anything not drawn by a widget counts as visible
+        owner = getattr(function, '__self__', None)
+        if self.root is None or not(isinstance(owner, tk.Misc)) or \
+            not(self.root.winfo_viewable()):
+            return True
+        return bool(owner.winfo_viewable())
+
     def update_all(self):
-        for (update_function,kwargs) in \
-            zip(self.update_functions,self.args):
-            update_function(data=self.data, **kwargs)
+        if self.root is None:
+            self.update_now()
+        elif self.pending is None:
+            self.pending = self.root.after_idle(self.update_now)
 
-class RecallFile:
-    def __init__(self):
-        self.file_path = os.path.join(os.path.curdir, 'recall.t3w')
-        self.parameters = {'version': 3,
-                           'dir': '',
-                           'file':'',
-                           'calib_file':'',
-                           'spaceWindow':20,
-                           'timeWindow':250,
-                           'coincWindow':1000,
-                           'clusterRange':30,
-                           'numScans':20,
-                           'beamI':str(t3.Beam(0,0,0,0)),
-                           'beamS':str(t3.Beam(0,0,0,0)),
-                           'fmin':-200,
-                           'fmax':200,
-                           'ref_file': '',
-                           'ref_scale':1.085,
-                           'ref_angle':-3.5,
-                           'ref_thresh':0.4,
-                           'ref_lower':25,
-                           'ref_upper':150,
-                           'ref_binning':3}
-
-        # check if the recall file exists. If it doesn't then make it
-        if not(os.path.exists(self.file_path)):
-            self.create_file()
-
-        self.read_file()
-
-    def create_file(self):
-        '''
-        File will be a csv where each entry is done as a dict. I will make the 
-        format of the base dict below. Whenever I want to extend this I cam just
-        add a new key-value pair to the dict.
-        '''
-        # BUG: only first pair of ilder and signal beam locations are recalled
-        # this can be fixed, but it is more work than I need right now
-        with open(self.file_path, 'w') as f:
-            w = csv.DictWriter(f, self.parameters.keys())
-            w.writeheader()
-            w.writerow(self.parameters)
-
-    def read_file(self):
-        try:   
-            with open(self.file_path, 'r') as f:
-                prelim = csv.reader(f) # check version
-                fields = prelim.__next__()
-                assert fields[0] == 'version'
-                values = prelim.__next__()
-                if len(values) == 0:
-                    values = prelim.__next__()
-                assert values[0] == str(self.parameters['version'])
-                
-            with open(self.file_path, 'r') as f:
-                r = csv.DictReader(f, self.parameters.keys())
-                for line in r: # sets twice, but needs to skip header
-                    self.parameters = line
-        except:
-            raise Exception('Save file is wrong version!\n'+\
-                            'Please note any needed settings from "recall.t3w" and then delte it!')
-
-
-    def write_file(self, new_parameters:dict, file_name:str=''):
-        # BUG: same beamI and beamS bug as above
-        if len(file_name) == 0:
-            file_name = self.file_path
-
-        with open(file_name, 'w') as f:
-            w = csv.DictWriter(f, fieldnames=new_parameters.keys())
-            w.writeheader()
-            w.writerow(new_parameters)
\ No newline at end of file
+    def update_now(self):
+        # also runs a scheduled update early, which then is not repeated
+        if self.pending is not None:
+            self.root.after_cancel(self.pending) #type:ignore
+            self.pending = None
+        for (i, (update_function,kwargs)) in \
+            enumerate(zip(self.update_functions,self.args)):
+            self.dirty[i] = not(self.visible(update_function))
+            if not(self.dirty[i]):
+                update_function(data=self.data, **kwargs)
+
+    def update_dirty(self):
+        # call when a tab is shown, redraws what was skipped while hidden
+        for (i, (update_function,kwargs)) in \
+            enumerate(zip(self.update_functions,self.args)):
+            if self.dirty[i] and self.visible(update_function):
+                self.dirty[i] = False
+                update_function(data=self.data, **kwargs)
+
+    def extend_all(self, new:np.ndarray):
+        if self.pending is not None:
+            return # about to be redrawn from scratch anyway
+        for (i, extend_function) in enumerate(self.extend_functions):
+            if extend_function is None or self.dirty[i]:
+                continue
+            if self.visible(self.update_functions[i]):
+                extend_function(new=new)
+            else:
+                self.dirty[i] = True # redrawn in full once shown
+
+class FilterChain:
+    '''
+    The filters which turn raw_data into filtered_data, as named stages run
+    in the order they were appended. Each stage keeps its last output along
+    with the parameters and the input it was made from, so running the chain
+    again after changing one stage only recomputes that stage and the ones
+    after it. Outputs are dropped as soon as they cannot be used again, i.e.
+    when their stage is cleared or raw_data is set.
+
+    # Parameters
+    raw_data:ReferentialNpArray
+        The input of the first stage
+    '''
+    def __init__(self, raw_data:ReferentialNpArray):
+        self.raw_data = raw_data
+        self.names = []
+        self.functions = {}
+        self.params = {}
+        self.cache = {}
+        self.generation = raw_data.generation
+
+    def append(self, name:str, function:Callable):
+        # function(data, *params) -> filtered data
+        self.names.append(name)
+        self.functions[name] = function
+        self.params[name] = None
+        self.cache[name] = (None, None, None)
+
+    def set(self, name:str, *params):
+        self.params[name] = params
+
+    def clear(self, *names:str):
+        # cleared stages are skipped until they are set again
+        for name in (self.names if len(names) == 0 else names):
+            self.params[name] = None
+            self.cache[name] = (None, None, None)
+
+    def invalidate(self):
+        # call when raw_data is set, so the old outputs are not kept alive
+        for name in self.names:
+            self.cache[name] = (None, None, None)
+        self.generation = self.raw_data.generation
+
+    def run(self) -> np.ndarray:
+        if self.generation != self.raw_data.generation:
+            self.invalidate()
+        data = self.raw_data.get()
+        for name in self.names:
+            params = self.params[name]
+            if params is None:
+                continue
+            (upstream, cached_params, output) = self.cache[name]
+            if upstream is not data or cached_params != params:
+                output = self.functions[name](data, *params)
+                self.cache[name] = (data, params, output)
+            data = output
+        return data
@@ -2,6 +2,7 @@ import tkinter as tk
 import customtkinter as ctk
 import os
 import time as t
+import traceback
 
 from Helpers import *
 from CustomTKWidgets import *
@@ -14,8 +15,8 @@ class LoadTab(ctk.CTkFrame):
     '''
     def __init__(self, *args, raw_data:ReferentialNpArray, \
                  filtered_data:ReferentialNpArray, raw_data_updates:CanvasList,\
-                    filtered_data_updates:CanvasList, errors:ErrorBox, \
-                        **kwargs):
+                    filtered_data_updates:CanvasList, jobs:JobRunner, \
+                        parameters:Callable, errors:ErrorBox, **kwargs):
         super().__init__(*args, **kwargs)
 
         # data from initializer
@@ -23,12 +24,15 @@ class LoadTab(ctk.CTkFrame):
         self.filtered_data = filtered_data
         self.raw_data_updates = raw_data_updates
         self.filtered_data_updates = filtered_data_updates
+        self.jobs = jobs
+        self.parameters = parameters
         self.errors = errors
         self.dir = tk.StringVar(self,
                                 os.path.dirname(os.path.realpath(__file__)))
 
         # global load data
         self.inp_file = tk.StringVar(self)
+        self.chunk_MB = tk.DoubleVar(self, 0) # 0 -> file is used in one piece
 
         # default settings
         self.beamI = []
@@ -53,22 +57,29 @@ class LoadTab(ctk.CTkFrame):
                                     raw_data_updates=self.raw_data_updates,\
                                     filtered_data_updates=self.filtered_data_updates,\
                                     load_state=self.load_state, \
+                                    metadata=self.export_metadata, \
+                                    jobs=self.jobs, \
                                     errors=self.errors, label_text="Import/Export",\
                                     label_sticky="left")
         self.loader = LoadingFrame(master=self, inp_file=self.inp_file,\
+                                   chunk_MB=self.chunk_MB, \
                                    beamCanvas = self.beamCanvas, \
                                    io = self.io, \
                                    load_state=self.load_state, \
                                    beamSelector = self.beamSelector, \
+                                   jobs=self.jobs, \
                                    errors=self.errors, label_text="Load", \
                                    label_sticky='left')
         self.process = ProcessFrame(master=self, inp_file=self.inp_file,\
+                                    chunk_MB=self.chunk_MB, \
                                     beamI=self.beamI, \
                                     beamS=self.beamS, raw_data=self.raw_data, \
                                     filtered_data=self.filtered_data,\
                                     load_state = self.load_state, \
                                     raw_data_updates=self.raw_data_updates, \
                                     filtered_data_updates=self.filtered_data_updates, \
+                                    show_hits=self.loader.show_hits, \
+                                    jobs=self.jobs, \
                                     errors=self.errors, \
                                     label_text="Process", \
                                     label_sticky='left')
@@ -105,7 +116,14 @@ class LoadTab(ctk.CTkFrame):
         self.beamI.append(t3.Beam.fromString(recall.parameters['beamI']))
         self.beamS.append(t3.Beam.fromString(recall.parameters['beamS']))
         self.beamSelector.redraw_beams()
+        self.process.restore()
     
+    def export_metadata(self) -> dict:
+        # stored alongside exported data, see save_t3c
+        return {'parameters': self.parameters(),
+                'beamI': [str(beam) for beam in self.beamI],
+                'beamS': [str(beam) for beam in self.beamS]}
+
     def recall_dir(self, recall:RecallFile):
         self.dir.set(recall.parameters['dir'])
 
@@ -128,6 +146,7 @@ class SettingsFrame(ctk.CTkFrame):
         self.coincWindow = tk.IntVar(self,1000)
         self.clusterRange = tk.IntVar(self,30)
         self.numScans = tk.IntVar(self,20)
+        self.parallel = tk.BooleanVar(self,False)
 
         # init widgets
         self.spaceLabel = ctk.CTkLabel(self,text='Space Window:')
@@ -151,6 +170,9 @@ class SettingsFrame(ctk.CTkFrame):
             defaultextension='.txt', filetypes=[('Text file','*.txt')],\
                 load_var=self.calibration_file)
         self.configEntry.populate()
+        self.parallelLabel = ctk.CTkLabel(self,text='Large files:')
+        self.parallelCheck = ctk.CTkCheckBox(self, \
+            text='Process all chunks in parallel', variable=self.parallel)
         # the above will be populated by the load tab global on runtime
 
         # layout widgets
@@ -168,6 +190,8 @@ class SettingsFrame(ctk.CTkFrame):
         self.scansEntry.grid(row=4,column=1,padx=(0,5),pady=5,sticky='w')
         self.configLabel.grid(row=5,column=0,padx=5,pady=5,sticky='e')
         self.configEntry.grid(row=5,column=1,padx=(0,5),pady=5,sticky='ew')
+        self.parallelLabel.grid(row=6,column=0,padx=5,pady=5,sticky='e')
+        self.parallelCheck.grid(row=6,column=1,padx=(0,5),pady=5,sticky='w')
 
     def recall(self, recall:RecallFile):
         self.calibration_file.set(recall.parameters['calib_file'])
@@ -320,6 +344,7 @@ class BeamSelect(LabeledFrame):
                         self.disable_signal_select() # finsih selecting
                 else:
                     self.beamSString.set(f'{{{oldstring}, {newstring}}}')
+            self.canvas.redraw() # the cursor only blits over the last draw
 
     def redraw_beams(self):
         if len(self.beamI) > 0 and len(self.beamS) > 0:
@@ -368,7 +393,7 @@ class ImportExportFrame(LabeledFrame):
     def __init__(self, *args, raw_data: ReferentialNpArray, \
                  filtered_data:ReferentialNpArray, raw_data_updates:CanvasList,\
                  filtered_data_updates:CanvasList, load_state:tk.StringVar, \
-                 errors:ErrorBox, **kwargs):
+                 metadata:Callable, jobs:JobRunner, errors:ErrorBox, **kwargs):
         super().__init__(*args, **kwargs)
 
         self.raw_data = raw_data
@@ -376,9 +401,19 @@ class ImportExportFrame(LabeledFrame):
         self.raw_data_updates = raw_data_updates
         self.filtered_data_updates = filtered_data_updates
         self.load_state = load_state
+        self.metadata = metadata
+        self.jobs = jobs
+        self.job = None
         self.errors = errors
         self.export_file = ctk.StringVar(self)
         self.import_files = ctk.StringVar(self)
+        self.memory_map = tk.BooleanVar(self, False)
+        self.merge = tk.BooleanVar(self, False)
+        self.dedupe = tk.BooleanVar(self, False)
+        # empty -> no limit
+        self.import_start = tk.StringVar(self, '')
+        self.import_stop = tk.StringVar(self, '')
+        self.import_roi = [tk.StringVar(self, '') for _ in range(4)]
 
         # tabs
         f = self.frame
@@ -391,14 +426,50 @@ class ImportExportFrame(LabeledFrame):
         # import stuff
         self.import_select = MultiLoadEntry(master=self.tabs.tab("Import"), \
                                     command=self.imprt, defaultextension='.npy',\
-                                    filetypes=[("NumPy data file",'*.npy')],\
+                                    filetypes=[("NumPy data file",'*.npy'), \
+                                               ("Compressed coincidences",'*.t3c')],\
                                     load_var=self.import_files, root=self.master.dir)
+        self.import_mmap = ctk.CTkCheckBox(self.tabs.tab("Import"), \
+                            text='Memory-map (for data larger than RAM)', \
+                            variable=self.memory_map)
+        self.import_merge = ctk.CTkCheckBox(self.tabs.tab("Import"), \
+                            text='Merge files in signal time order', \
+                            variable=self.merge)
+        self.import_dedupe = ctk.CTkCheckBox(self.tabs.tab("Import"), \
+                            text='Drop duplicates', variable=self.dedupe)
+        self.import_range = ctk.CTkFrame(self.tabs.tab("Import"), \
+                                         fg_color='transparent')
+        self.start_entry = LabeledEntry(self.import_range, \
+                                        var_ref=self.import_start, \
+                                        label_text='Only time (s):', \
+                                        label_side='before')
+        self.stop_entry = LabeledEntry(self.import_range, \
+                                       var_ref=self.import_stop, \
+                                       label_text='to', label_side='before')
+        self.roi_entries = [LabeledEntry(self.import_range, var_ref=var, \
+                                         label_text=text, label_side='before') \
+                            for (var, text) in zip(self.import_roi, \
+                                ['Only pixels x:', 'to', 'y:', 'to'])]
         self.import_info = ctk.CTkTextbox(self.tabs.tab("Import"),height=56)
         self.import_info.insert('end',"Note: importing will not update anything on this tab except for this dialog box.")
 
         self.tabs.tab("Import").grid_columnconfigure(0,weight=1)
-        self.import_select.grid(row=0,column=0,padx=5,pady=(5,3),sticky='ew')
-        self.import_info.grid(row=1,column=0,padx=5,pady=(0,5),sticky='ew')
+        self.import_select.grid(row=0,column=0,columnspan=2,padx=5,pady=(5,3),\
+                                sticky='ew')
+        self.import_mmap.grid(row=1,column=0,columnspan=2,padx=5,pady=(0,3),\
+                              sticky='ew')
+        self.import_merge.grid(row=2,column=0,padx=(5,3),pady=(0,3),sticky='ew')
+        self.import_dedupe.grid(row=2,column=1,padx=(0,5),pady=(0,3),\
+                                sticky='ew')
+        self.import_range.grid(row=3,column=0,columnspan=2,padx=5,pady=(0,3),\
+                               sticky='ew')
+        self.import_info.grid(row=4,column=0,columnspan=2,padx=5,pady=(0,5),\
+                              sticky='ew')
+        self.start_entry.grid(row=0,column=0,columnspan=2,sticky='w')
+        self.stop_entry.grid(row=0,column=2,columnspan=2,padx=(3,0),sticky='w')
+        for (i, entry) in enumerate(self.roi_entries):
+            entry.grid(row=1,column=i,padx=(0 if i == 0 else 3,0),pady=(3,0),\
+                       sticky='w')
 
         # export stuff
         self.file_display = ctk.CTkEntry(self.tabs.tab("Export"))
@@ -429,47 +500,98 @@ class ImportExportFrame(LabeledFrame):
                 self.tabs._corner_radius, self.tabs._border_width)))
             
     def imprt(self):
+        if self.import_select.get() == "":
+            self.errors.append("Please select a file for importing.")
+            return
+        if self.job is not None and self.job.running():
+            self.errors.append("Already importing or exporting!")
+            return
         try:
-            if self.import_select.get() == "":
-                self.errors.append("Please select a file for importing.")
-                return
-            
-            arrs = self.import_select.get()
-            self.master.dir.set(os.path.dirname(arrs[0]))
-            
-            self.import_info.delete('1.0', 'end')
-            self.import_info.insert('1.0', f'Importing file(s):\n')
-            self.import_info.insert('end', f'\tImport progress: {0.0:4.1f}%')
-            self.master.update_idletasks()
-            loaded_arr = np.load(arrs[0])
-            for i,arr in enumerate(arrs[1:]):
-                if i==0:
-                    percent = 1/len(arrs)*100
-                    self.import_info.delete('2.1', 'end')
-                    self.import_info.insert('2.1', 
-                                            f'Import progress: {percent:4.1f}%')
-                    self.master.update_idletasks()
-                loaded_arr = np.concatenate((loaded_arr, np.load(arr)), axis=2)
-                percent = (i+2)/len(arrs)*100
-                self.import_info.delete('2.1', 'end')
-                self.import_info.insert('2.1', f'Import progress: {percent:4.1f}%')
-                self.master.update_idletasks()
-
-            self.import_info.insert('end', f'\n\tUpdating plots (may take some time)...')
-            self.master.update_idletasks()
-
-            self.raw_data.set(loaded_arr)
-            self.filtered_data.set(loaded_arr)
-            self.raw_data_updates.update_all()
-            self.filtered_data_updates.update_all()
-
-            self.import_info.delete('1.0', 'end')
-            self.import_info.insert('1.0',f'Import completed with {self.raw_data.get().shape[-1]} coincidences!')
-
-            self.update(arrs[0])
-        except Exception as e:
-            self.errors.append(f'Exception thrown during import:', True)
+            (start, stop, roi) = self.get_import_range()
+        except ValueError:
+            self.errors.append("The import time and pixel limits must be " +\
+                               "numbers or empty.")
+            return
+
+        arrs = self.import_select.get()
+        self.master.dir.set(os.path.dirname(arrs[0]))
+
+        self.import_info.delete('1.0', 'end')
+        self.import_info.insert('1.0', f'Importing {len(arrs)} file(s)...')
+        self.job = self.jobs.submit(self.read, \
+            args=(arrs, self.memory_map.get(), self.merge.get(), \
+                  self.dedupe.get(), start, stop, roi), \
+            on_done=lambda data: self.imported(arrs, data), \
+            on_error=lambda error: self.failed('import', error))
+        self.monitor(self.job, self.import_info)
+
+    @staticmethod
+    def read(arrs:list[str], memory_map:bool, merge:bool, dedupe:bool, \
+             start:float|None, stop:float|None, roi:tuple|None, \
+             progress:Progress, token:CancelToken) -> np.ndarray|VirtualArray:
+        # runs on a worker thread, so only touches what it is given
+        partial = start is not None or stop is not None or roi is not None or\
+            any(arr.endswith('.t3c') for arr in arrs)
+        if merge:
+            if partial:
+                runs = load_partial(arrs, start, stop, roi, join=False, \
+                                    progress=progress, token=token)
+            else:
+                runs = [np.load(arr, mmap_mode='r') for arr in arrs]
+            data = merge_runs(runs, dedupe, progress=progress, token=token)
+        elif partial:
+            # scanned chunk by chunk, only the matches are kept
+            data = load_partial(arrs, start, stop, roi, progress=progress, \
+                                token=token)
+        elif memory_map:
+            # only read as it is used, chunk by chunk
+            return VirtualArray(arrs)
+        else:
+            data = load_npy_files(arrs, progress, token)
+        progress.stage = 'Compacting'
+        return CoincidenceArray(data)
+
+    def imported(self, arrs:list[str], data:np.ndarray|VirtualArray):
+        self.import_info.delete('1.0', 'end')
+        self.import_info.insert('1.0', 'Updating plots (may take some time)...')
+        self.update_idletasks()
+
+        self.raw_data.set(data)
+        self.filtered_data.set(data)
+        self.raw_data_updates.update_all()
+        self.filtered_data_updates.update_all()
+
+        self.import_info.delete('1.0', 'end')
+        self.import_info.insert('1.0',f'Import completed with {self.raw_data.get().shape[-1]} coincidences!')
+
+        self.update(arrs[0])
+
+    def failed(self, what:str, error:BaseException):
+        self.errors.append(f'Exception thrown during {what}: {error!r}')
+        traceback.print_exception(error)
+
+    def monitor(self, job:Job, info:ctk.CTkTextbox|ctk.CTkEntry):
+        if not(job.running()):
+            return
+        if job.progress.done > 0:
+            if isinstance(info, ctk.CTkTextbox):
+                info.delete('1.0', 'end')
+                info.insert('1.0', str(job.progress))
+            else:
+                info.delete(0, 'end')
+                info.insert(0, f'{os.path.basename(self.export_file.get())}' +\
+                            f' - {job.progress.fraction()*100:.0f}%')
+        self.after(100, lambda: self.monitor(job, info))
         
+    def get_import_range(self) -> tuple:
+        # (start, stop, roi) as taken by load_partial, None where left empty
+        value = lambda var: None if var.get().strip() == '' \
+            else float(var.get())
+        roi = tuple(value(var) for var in self.import_roi)
+        if all(lim is None for lim in roi):
+            roi = None
+        return (value(self.import_start), value(self.import_stop), roi)
+
     def export(self):
         if self.export_file.get() == "":
             self.errors.append("A valid path to an export file must be selected.")
@@ -477,23 +599,36 @@ class ImportExportFrame(LabeledFrame):
         if self.filtered_data.get().shape[0] == 0:
             self.errors.append("The file must be processed to export.")
             return
-        try:
-            np.save(self.export_file.get(), self.filtered_data.get())
-            self.file_display.insert('end', " - Exported!")
-        except Exception as e:
-            self.errors.append("Error during export:", True)
+        if self.job is not None and self.job.running():
+            self.errors.append("Already importing or exporting!")
+            return
+        file_name = self.export_file.get()
+        if file_name.endswith('.t3c'):
+            (target, args) = (save_t3c, (file_name, self.filtered_data.get(), \
+                                         self.metadata()))
+        else:
+            (target, args) = (save_npy, (file_name, self.filtered_data.get()))
+        self.job = self.jobs.submit(target, args=args, \
+            on_done=lambda _: self.exported(file_name), \
+            on_error=lambda error: self.failed('export', error))
+        self.monitor(self.job, self.file_display)
+
+    def exported(self, file_name:str):
+        self.file_display.delete(0, 'end')
+        self.file_display.insert(0, os.path.basename(file_name) + " - Exported!")
 
     def export_as(self):
         initdir = os.path.dirname(os.path.realpath(self.export_file.get()))
         initfile = os.path.basename(os.path.realpath(self.export_file.get()))
         fname = tkinter.filedialog.asksaveasfilename(initialdir=initdir, \
             initialfile=initfile, defaultextension=".npy", \
-                filetypes=[("NumPy data file","*.npy")])
+                filetypes=[("NumPy data file","*.npy"), \
+                           ("Compressed coincidences","*.t3c")])
         self.update(fname)
         self.export()
 
     def update(self, file_name:str):
-        if file_name != "" and file_name[-4:] != ".npy":
+        if file_name != "" and file_name[-4:] not in (".npy", ".t3c"):
             file_name = '.'.join(file_name.split('.')[:-1])
             file_name = file_name + ".npy"
         self.export_file.set(file_name)
@@ -502,18 +637,24 @@ class ImportExportFrame(LabeledFrame):
         self.file_display.insert(0, os.path.basename(self.export_file.get()))
         
 class LoadingFrame(LabeledFrame):
-    def __init__(self, *args, inp_file:tk.StringVar, beamCanvas:CanvasFrame,\
-                 io:ImportExportFrame, load_state:tk.StringVar, \
-                    beamSelector:BeamSelect, errors:ErrorBox, **kwargs):
+    def __init__(self, *args, inp_file:tk.StringVar, chunk_MB:tk.DoubleVar, \
+                 beamCanvas:CanvasFrame, io:ImportExportFrame, \
+                 load_state:tk.StringVar, beamSelector:BeamSelect, \
+                 jobs:JobRunner, errors:ErrorBox, **kwargs):
         super().__init__(*args, **kwargs)
 
         # init data
         self.inp_file = inp_file
+        self.chunk_MB = chunk_MB
+        self.jobs = jobs
         self.errors = errors
         self.io = io
         self.beamCanvas = beamCanvas
         self.load_state = load_state
         self.beamSelector = beamSelector
+        self.sampler = None
+        self.sampler_job = None
+        self.hit_image = None
 
         # init widgets
         f = self.frame
@@ -536,16 +677,22 @@ class LoadingFrame(LabeledFrame):
         self.reload_button.grid(row=1,padx=5,pady=(3,5),sticky='ew')
 
     def load_preview(self,reloaded=False):
-        if self.check_size():
-            return
+        self.check_size()
         
         self.io.update(self.inp_file.get())        
         try:
             if self.inp_file.get() != '':
                 self.master.dir.set(os.path.dirname(self.inp_file.get()))
-                (tdc,pix) = t3.parse_raw_file(self.inp_file.get())
+                # the preview only needs where the hits are, so it is built
+                # from a sample of the raw packets rather than a full parse
+                if self.sampler_job is not None:
+                    self.sampler_job.cancel()
+                self.sampler = HitMapSampler(self.inp_file.get())
+                counts = self.sampler.first()
                 self.beamCanvas.ax.clear()
-                t3view.plot_hits(pix,fig=self.beamCanvas.figure)
+                self.hit_image = self.beamCanvas.ax.imshow(counts.T, \
+                                                    origin='lower', \
+                                                    interpolation='none')
                 self.beamCanvas.ax.set_xlabel("$X$ (pixels)")
                 self.beamCanvas.ax.set_ylabel("$Y$ (pixels)")
                 self.beamCanvas.redraw()
@@ -553,20 +700,45 @@ class LoadingFrame(LabeledFrame):
                 if not(reloaded):
                     self.load_state.set('Select beams...') 
                 self.beamSelector.redraw_beams()
+
+                sampler = self.sampler
+                self.sampler_job = self.jobs.submit(self.sampler.run, \
+                    on_done=lambda result: self.refine(sampler), \
+                    on_error=lambda error: self.errors.append(\
+                        f'Exception thrown while sampling the preview: {error}'))
+                self.after(250, lambda: self.refine(sampler))
             else:
                 self.errors.append(f'Please select an input file when loading')
         except Exception as e:
             print(f'{self.inp_file.get()=}')
             self.errors.append(f'Exception thrown during load:', True)
             
+    def refine(self, sampler:HitMapSampler):
+        if sampler is not self.sampler:
+            return # a different file has been loaded since
+        self.show_hits(sampler.counts)
+        if self.sampler_job is not None and self.sampler_job.running():
+            self.after(250, lambda: self.refine(sampler))
+
+    def show_hits(self, counts:np.ndarray):
+        if self.hit_image is None:
+            self.hit_image = self.beamCanvas.ax.imshow(counts.T, \
+                                                       origin='lower', \
+                                                       interpolation='none')
+        else:
+            self.hit_image.set_data(counts.T)
+        self.hit_image.set_clim(0, max(1, counts.max()))
+        self.beamCanvas.redraw()
+
     def check_size(self):
+        self.chunk_MB.set(0)
         file_size_MB = os.stat(self.inp_file.get()).st_size / (1024**2)
         if file_size_MB > 500:
             warning_text = f"The file '{os.path.basename(self.inp_file.get())}' is {file_size_MB:.0f}MB " +\
                 "in size! This is likely too big to parse all at once. " +\
-                "Please enter the size in MB of the files it wil be chopped "+\
-                "into. For context, 500MB is a good size for 8GB of VRAM.\n" +\
-                "NOTE: This process can take a *long* time."
+                "Please enter the size in MB of the chunks it will be " +\
+                "streamed in. For context, 500MB is a good size for 8GB of " +\
+                "VRAM."
 
             parse_dialog = Popup(title="WARNING!", text=warning_text, 
                                  default_value="500")
@@ -574,38 +746,23 @@ class LoadingFrame(LabeledFrame):
             
             if parse_file:
                 try:
-                    thread = ReturnThread(target=t3.chop_large_file,
-                                          args=(self.inp_file.get(),
-                                                float(parse_file)))
-                    thread.start() # hangs on thread start. not sure why
-                    self.monitor(thread, 0)
+                    self.chunk_MB.set(float(parse_file))
                 except Exception as e:
-                    self.errors.append("Chopping error: ", True)
-            return bool(parse_file)
-        return False
-                
-    def monitor(self, thread:ReturnThread, dot):
-        if thread.is_alive():
-            self.load_dialog.clear_and_insert(0, 
-                    f"Chopping {os.path.basename(self.inp_file.get())}" +\
-                        ("." * int((dot/10)%4)))
-            dot += 1
-            self.after(50,lambda: self.monitor(thread, dot))
-        else:
-            self.inp_file.set(f"{self.inp_file.get()[:-5]}/part_000.tpx3")
-            self.load_dialog.populate()
-            self.load_preview()
+                    self.errors.append("Invalid chunk size: ", True)
 
 class ProcessFrame(LabeledFrame):
-    def __init__(self, *args, inp_file:tk.StringVar, beamI:list[t3.Beam], \
+    def __init__(self, *args, inp_file:tk.StringVar, chunk_MB:tk.DoubleVar, \
+                 beamI:list[t3.Beam], \
                  beamS:list[t3.Beam], raw_data:ReferentialNpArray, \
                  filtered_data:ReferentialNpArray, load_state:tk.StringVar, \
                  raw_data_updates:CanvasList, filtered_data_updates:CanvasList,\
-                 errors:ErrorBox, **kwargs):
+                 show_hits:Callable, jobs:JobRunner, errors:ErrorBox, \
+                 **kwargs):
         super().__init__(*args, **kwargs)
 
         # init data
         self.inp_file = inp_file
+        self.chunk_MB = chunk_MB
         self.beamI = beamI
         self.beamS = beamS
         self.raw_data = raw_data
@@ -613,7 +770,13 @@ class ProcessFrame(LabeledFrame):
         self.raw_data_updates = raw_data_updates
         self.filtered_data_updates = filtered_data_updates
         self.load_state = load_state
+        self.show_hits = show_hits
+        self.jobs = jobs
         self.errors = errors
+        self.job = None
+        self.tail = None
+        self.followed_data = GrowableNpArray()
+        self.followed_hits = np.zeros((256,256), dtype=np.int64)
 
         # create widgets
         f = self.frame
@@ -624,54 +787,244 @@ class ProcessFrame(LabeledFrame):
         self.load_bar.set(0)
         self.load_button = ctk.CTkButton(master=f,width=0,text='Process',\
                                          command=self.process)
+        self.follow_button = ctk.CTkButton(master=f,width=0,text='Follow',\
+                                           command=self.toggle_follow)
         self.state = ctk.CTkEntry(master=f,textvariable=self.load_state)
 
         f.grid_columnconfigure(0,weight=1)
 
-        self.settings_dropdown.grid(row=0,column=0,columnspan=2,padx=5,\
+        self.settings_dropdown.grid(row=0,column=0,columnspan=3,padx=5,\
                                     pady=(5,3), sticky='ew')
         self.load_bar.grid(row=1,column=0,padx=(5,3),pady=0,sticky='ew')
-        self.load_button.grid(row=1,column=1,padx=(0,5),pady=0,sticky='ew')
-        self.state.grid(row=2,column=0,columnspan=2,padx=5,pady=(3,5),\
+        self.load_button.grid(row=1,column=1,padx=(0,3),pady=0,sticky='ew')
+        self.follow_button.grid(row=1,column=2,padx=(0,5),pady=0,sticky='ew')
+        self.state.grid(row=2,column=0,columnspan=3,padx=5,pady=(3,5),\
             sticky='ew')
     
-    def process(self):
+    def can_process(self) -> bool:
+        if self.job is not None and self.job.running():
+            self.errors.append('Already processing! Cancel it first.')
+            return False
+        if self.tail is not None:
+            self.errors.append('Already following! Stop following first.')
+            return False
         if len(self.settings.calibration_file.get()) == 0:
             self.errors.append('Please select a calibration file!')
-            return
+            return False
         if len(self.inp_file.get()) == 0:
             self.errors.append('Please select an input file!')
+            return False
+        return True
+
+    def process(self):
+        if not(self.can_process()):
             return
         try:
             self.load_state.set('Processing...')
             self.load_bar.configure(mode='indeterminate')
-            thread = ReturnThread(target=t3.process_Coincidences, \
-                                  args=(self.inp_file.get(), \
-                                        self.settings.calibration_file.get(), \
-                                        self.beamS, self.beamI, \
-                                        self.settings.timeWindow.get(),\
-                                        self.settings.spaceWindow.get(),\
-                                        self.settings.coincWindow.get(),\
-                                        self.settings.clusterRange.get(),\
-                                        self.settings.numScans.get()))
-            thread.start()
-            self.monitor(thread)
+            if self.settings.parallel.get():
+                target = process_parallel
+            else:
+                target = process_stream
+            job = self.jobs.submit(self.compacted, \
+                                   args=(process_cached, target) + \
+                                        self.process_args(), \
+                                   on_done=lambda data: \
+                                        self.finished(job, data), \
+                                   on_error=lambda error: \
+                                        self.failed(job, error), \
+                                   on_cancel=lambda: self.cancelled(job))
+            self.job = job
+            self.load_button.configure(text='Cancel', command=self.cancel)
+            self.monitor(self.job)
         except Exception as e:
             self.load_state.set('Error while processing! See below.')
             self.errors.append("Process error: ", True)
+
+    def cancel(self):
+        if self.job is not None:
+            self.load_state.set('Cancelling after the current chunk...')
+            self.job.cancel()
         
-    def monitor(self,thread:ReturnThread):
-        if thread.is_alive():
-            self.load_bar.step()
-            self.load_bar.update_idletasks()
-            self.after(50,lambda: self.monitor(thread))
+    def process_args(self) -> tuple:
+        # the arguments of process_stream, in order
+        return (self.inp_file.get(), \
+                self.chunk_MB.get(), \
+                self.settings.calibration_file.get(), \
+                list(self.beamS), list(self.beamI), \
+                self.settings.timeWindow.get(),\
+                self.settings.spaceWindow.get(),\
+                self.settings.coincWindow.get(),\
+                self.settings.clusterRange.get(),\
+                self.settings.numScans.get())
+
+    def restore(self):
+        # show the result of an earlier identical run, if there is one
+        if len(self.inp_file.get()) == 0 or \
+            len(self.settings.calibration_file.get()) == 0:
+            return
+        if (self.job is not None and self.job.running()) or \
+            self.tail is not None:
+            return # never takes the controls over from a running job
+        # the cached result can be GBs, so it is read in the background
+        previous = self.load_state.get()
+        self.load_state.set('Restoring previous result...')
+        self.load_bar.configure(mode='indeterminate')
+        job = self.jobs.submit(self.compacted, \
+            args=(cached_coincidences,) + self.process_args(), \
+            on_done=lambda data: self.restored(job, data, previous), \
+            on_error=lambda error: self.restore_failed(job, error, previous), \
+            on_cancel=lambda: self.restored(job, None, previous))
+        self.job = job
+        self.load_button.configure(text='Cancel', command=self.cancel)
+        self.monitor(job)
+
+    @staticmethod
+    def compacted(target:Callable, *args, progress:Progress, \
+                  token:CancelToken) -> CoincidenceArray|None:
+        # runs on a worker thread, so the Tk thread only has to show it
+        data = target(*args, progress=progress, token=token)
+        if data is None:
+            return None
+        token.check()
+        progress.stage = 'Compacting'
+        return CoincidenceArray(data)
+
+    def restored(self, job:Job, data:CoincidenceArray|None, previous:str):
+        if job is not self.job:
+            return
+        self.reset_controls()
+        if data is None or job.token.cancelled():
+            self.load_bar.set(0)
+            self.load_state.set(previous)
         else:
-            self.raw_data.set(thread.get()) #type: ignore
-            self.filtered_data.set(self.raw_data.get())
-            self.raw_data_updates.update_all()
-            self.filtered_data_updates.update_all()
+            self.show_result(data)
 
+    def restore_failed(self, job:Job, error:BaseException, previous:str):
+        if job is not self.job:
+            return
+        self.reset_controls()
+        self.load_bar.set(0)
+        self.load_state.set(previous)
+        self.errors.append(f'Error restoring previous result: {error!r}')
+        traceback.print_exception(error)
+
+    def monitor(self, job:Job):
+        # only refreshes the progress display, the result arrives through
+        # the job's callbacks
+        if job is not self.job or not(job.running()) or \
+            job.token.cancelled():
+            return
+        if job.progress.done == 0:
+            # nothing to measure until the first chunk is done
+            self.load_bar.step()
+        else:
             self.load_bar.configure(mode='determinate')
-            self.load_bar.set(1)
-            self.load_state.set(\
-                f'Complete! Number of coincidences is {self.raw_data.get().shape[2]}.')
+            self.load_bar.set(job.progress.fraction())
+        self.load_state.set(str(job.progress))
+        self.after(100,lambda: self.monitor(job))
+
+    def reset_controls(self):
+        self.load_button.configure(text='Process', command=self.process)
+        self.load_bar.configure(mode='determinate')
+
+    def finished(self, job:Job, data:CoincidenceArray):
+        if job is not self.job:
+            return # the controls belong to another job by now
+        self.reset_controls()
+        self.show_result(data, job.progress)
+
+    def failed(self, job:Job, error:BaseException):
+        if job is not self.job:
+            return
+        self.reset_controls()
+        self.load_bar.set(0)
+        self.load_state.set('Error while processing! See below.')
+        self.errors.append(f'Process error: {error!r}')
+        traceback.print_exception(error)
+
+    def cancelled(self, job:Job):
+        if job is not self.job:
+            return
+        self.reset_controls()
+        self.load_bar.set(0)
+        self.load_state.set('Processing cancelled.')
+
+    def show_result(self, data:CoincidenceArray, \
+                    progress:Progress|None=None):
+        self.raw_data.set(data)
+        self.filtered_data.set(self.raw_data.get())
+        self.raw_data_updates.update_all()
+        self.filtered_data_updates.update_all()
+
+        self.load_bar.configure(mode='determinate')
+        self.load_bar.set(1)
+        stats = ''
+        if progress is not None and progress.done > 0:
+            stats = f' ({progress.done/1024**2:.0f}MB at ' +\
+                    f'{progress.rate():.1f}MB/s)'
+        self.load_state.set(\
+            f'Complete! Number of coincidences is {self.raw_data.get().shape[2]}.'\
+            + stats)
+
+    def toggle_follow(self):
+        if self.tail is None:
+            self.start_follow()
+        else:
+            self.stop_follow()
+
+    def start_follow(self):
+        # watch the input file as it is written, processing only what is new
+        if not(self.can_process()):
+            return
+        self.tail = FileTail(self.inp_file.get(), self.chunk_MB.get())
+        self.followed_data = GrowableNpArray()
+        self.followed_hits = np.zeros((256,256), dtype=np.int64)
+        self.follow_button.configure(text='Stop following')
+        self.load_button.configure(state=tk.DISABLED)
+        self.load_state.set('Following...')
+        self.follow(self.tail)
+
+    def stop_follow(self):
+        self.tail = None
+        if self.job is not None:
+            self.job.cancel()
+        self.follow_button.configure(text='Follow')
+        self.load_button.configure(state=tk.NORMAL)
+        # plots without an incremental update are only redrawn now
+        self.filtered_data_updates.update_all()
+
+    def follow(self, tail:FileTail):
+        if tail is not self.tail:
+            return # stopped or restarted since
+        # finding the new chunks is part of the job, it can take a while
+        self.job = self.jobs.submit(tail_step, \
+            args=(tail,) + self.process_args()[2:], \
+            on_done=lambda result: self.followed(tail, result), \
+            on_error=self.follow_failed)
+
+    def followed(self, tail:FileTail, \
+                 result:tuple[int,bool,np.ndarray,np.ndarray]):
+        if tail is not self.tail:
+            return
+        (stop, more, counts, new) = result
+        # straight on while catching up, otherwise wait for more to be written
+        delay = 0 if more and stop > tail.offset else 1000
+        tail.offset = stop
+        self.followed_hits += counts
+        self.show_hits(self.followed_hits)
+
+        if new.ndim == 3 and new.shape[2] > 0:
+            self.followed_data.extend(new)
+            self.raw_data.set(self.followed_data.get())
+            self.filtered_data.set(self.raw_data.get())
+            self.raw_data_updates.extend_all(new)
+            self.filtered_data_updates.extend_all(new)
+        self.load_state.set(f'Following: {self.followed_data.size} ' +\
+                            f'coincidences from {tail.offset/1024**2:.0f}MB')
+        self.after(delay, lambda: self.follow(tail))
+
+    def follow_failed(self, error:BaseException):
+        self.stop_follow()
+        self.errors.append(f'Error while following: {error!r}')
+        traceback.print_exception(error)
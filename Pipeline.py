@@ -0,0 +1,698 @@
+import os
+import csv
+import mmap
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import multiprocessing
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+
+import tpx3_toolkit as t3
+
+# Everything in here is kept free of tkinter so that it can be imported by
+# worker processes without dragging the whole GUI along with it
+
+class RecallFile:
+    '''
+    The settings file which holds the state of the app between sessions. It
+    is also used as the settings file of Batch.py.
+
+    # Parameters
+    file_path:str
+        Optional. The file to read, defaults to "recall.t3w" in the working
+        directory. It is created with the default settings if it does not exist.
+    '''
+    def __init__(self, file_path:str=''):
+        if len(file_path) == 0:
+            file_path = os.path.join(os.path.curdir, 'recall.t3w')
+        self.file_path = file_path
+        self.parameters = {'version': 3,
+                           'dir': '',
+                           'file':'',
+                           'calib_file':'',
+                           'spaceWindow':20,
+                           'timeWindow':250,
+                           'coincWindow':1000,
+                           'clusterRange':30,
+                           'numScans':20,
+                           'beamI':str(t3.Beam(0,0,0,0)),
+                           'beamS':str(t3.Beam(0,0,0,0)),
+                           'fmin':-200,
+                           'fmax':200,
+                           'ref_file': '',
+                           'ref_scale':1.085,
+                           'ref_angle':-3.5,
+                           'ref_thresh':0.4,
+                           'ref_lower':25,
+                           'ref_upper':150,
+                           'ref_binning':3}
+
+        # check if the recall file exists. If it doesn't then make it
+        if not(os.path.exists(self.file_path)):
+            self.create_file()
+
+        self.read_file()
+
+    def create_file(self):
+        '''
+        File will be a csv where each entry is done as a dict. I will make the 
+        format of the base dict below. Whenever I want to extend this I cam just
+        add a new key-value pair to the dict.
+        '''
+        # BUG: only first pair of ilder and signal beam locations are recalled
+        # this can be fixed, but it is more work than I need right now
+        with open(self.file_path, 'w') as f:
+            w = csv.DictWriter(f, self.parameters.keys())
+            w.writeheader()
+            w.writerow(self.parameters)
+
+    def read_file(self):
+        try:   
+            with open(self.file_path, 'r') as f:
+                prelim = csv.reader(f) # check version
+                fields = prelim.__next__()
+                assert fields[0] == 'version'
+                values = prelim.__next__()
+                if len(values) == 0:
+                    values = prelim.__next__()
+                assert values[0] == str(self.parameters['version'])
+                
+            with open(self.file_path, 'r') as f:
+                r = csv.DictReader(f, self.parameters.keys())
+                for line in r: # sets twice, but needs to skip header
+                    self.parameters = line
+        except:
+            raise Exception('Save file is wrong version!\n'+\
+                            'Please note any needed settings from "recall.t3w" and then delte it!')
+
+
+    def write_file(self, new_parameters:dict, file_name:str=''):
+        # BUG: same beamI and beamS bug as above
+        if len(file_name) == 0:
+            file_name = self.file_path
+
+        with open(file_name, 'w') as f:
+            w = csv.DictWriter(f, fieldnames=new_parameters.keys())
+            w.writeheader()
+            w.writerow(new_parameters)
+
+class Cancelled(Exception):
+    pass
+
+class CancelToken:
+    '''
+    Handed to a background job so that it can be asked to stop. Jobs call
+    check() between chunks of work, which raises Cancelled once cancel() has
+    been called from any other thread.
+    '''
+    def __init__(self):
+        self.event = threading.Event()
+
+    def cancel(self):
+        self.event.set()
+
+    def cancelled(self) -> bool:
+        return self.event.is_set()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled()
+
+class Progress:
+    '''
+    Progress of a long job in bytes of raw data consumed, along with the stage
+    it is in. Written by the job's thread and read by the GUI, which only ever
+    reads whole attributes so no locking is needed.
+    '''
+    def __init__(self):
+        self.stage = 'Starting'
+        self.total = 0
+        self.done = 0
+        self.start = time.time()
+
+    def begin(self, total:int, stage:str):
+        self.total = total
+        self.done = 0
+        self.stage = stage
+        self.start = time.time()
+
+    def advance(self, num_bytes:int, stage:str|None=None):
+        self.done += num_bytes
+        if stage is not None:
+            self.stage = stage
+
+    def fraction(self) -> float:
+        return self.done / self.total if self.total > 0 else 0
+
+    def rate(self) -> float:
+        # MB/s
+        elapsed = time.time() - self.start
+        return self.done / 1024**2 / elapsed if elapsed > 0 else 0
+
+    def eta(self) -> str:
+        if self.done == 0:
+            return '?'
+        seconds = (self.total - self.done) / 1024**2 / self.rate()
+        (minutes, seconds) = divmod(int(seconds), 60)
+        return f'{minutes}:{seconds:02d}'
+
+    def __str__(self) -> str:
+        return f'{self.stage}: {self.done/1024**2:.0f}/' +\
+               f'{self.total/1024**2:.0f}MB at {self.rate():.1f}MB/s, ' +\
+               f'ETA {self.eta()}'
+
+class DiskCache:
+    '''
+    A directory of .npz files holding cached arrays, capped in size. The
+    modification time of each file doubles as its last use time, and the least
+    recently used files are removed whenever the cap is exceeded.
+
+    # Parameters
+    directory:str
+        Where the cache files are kept. Created on the first write.
+    max_MB:float
+        The most disk space the cache may use in MB
+    '''
+    def __init__(self, directory:str, max_MB:float=4096):
+        self.directory = directory
+        self.max_size = int(max_MB * 1024**2)
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, key + '.npz')
+
+    def get(self, key:str) -> dict | None:
+        path = self.path(key)
+        try:
+            with np.load(path) as f:
+                arrays = {name: f[name] for name in f.files}
+            os.utime(path) # mark as recently used
+            return arrays
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key:str, **arrays):
+        os.makedirs(self.directory, exist_ok=True)
+        # write then rename so a crash never leaves a half written entry, the
+        # pid keeps processes sharing the cache out of each other's way
+        tmp = self.path(key) + f'.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self.path(key))
+        self.evict()
+
+    def evict(self):
+        # other processes may be evicting at the same time
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+        entries.sort()
+        total = sum(size for (_, size, _) in entries)
+        for (_, size, name) in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+            total -= size
+
+def file_identity(file_name:str) -> tuple:
+    '''
+    Identifies the contents of a file by its path, size, modification time and
+    a hash of its first, middle and last MB. Hashing the whole file would take
+    about as long as parsing it.
+    '''
+    stat = os.stat(file_name)
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_name, 'rb') as f:
+        for pos in (0, stat.st_size // 2, max(0, stat.st_size - 1024**2)):
+            f.seek(pos)
+            h.update(f.read(1024**2))
+    return (os.path.realpath(file_name), stat.st_size, stat.st_mtime_ns, \
+            h.hexdigest())
+
+parse_cache = DiskCache(os.path.join(os.path.curdir, 'cache', 'parse'))
+result_cache = DiskCache(os.path.join(os.path.curdir, 'cache', 'results'), \
+                         max_MB=8192)
+
+# Where chunks are staged for tpx3_toolkit. Unset, they go next to the raw
+# file, whose disk holds the file anyway, rather than in /tmp (often RAM).
+STAGE_DIR = os.environ.get('PIXGUI_STAGE_DIR', '')
+
+def stage_dir(file_name:str) -> str:
+    directory = STAGE_DIR
+    if len(directory) == 0:
+        directory = os.path.dirname(os.path.realpath(file_name))
+    if not(os.access(directory, os.W_OK)):
+        directory = tempfile.gettempdir()
+    return directory
+
+class RawFileStream:
+    '''
+    A memory-mapped, read-only view of a raw .tpx3 file which hands it out in
+    packet-aligned chunks of roughly a fixed size. Nothing is read until a
+    chunk is actually used, and chunk boundaries always land on a "TPX3" chunk
+    header so no packet is ever split between two chunks.
+
+    # Parameters
+    file_name:str
+        The raw file to stream
+    chunk_MB:float
+        The approximate size of each chunk in MB. 0 means the whole file is
+        a single chunk.
+    '''
+    HEADER = b'TPX3'
+
+    def __init__(self, file_name:str, chunk_MB:float=0):
+        self.file_name = file_name
+        self.file = open(file_name, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        if chunk_MB > 0:
+            self.chunk_size = int(chunk_MB * 1024**2)
+        else:
+            self.chunk_size = self.size
+
+        # mmap cannot map an empty file
+        if self.size > 0:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            self.map = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def align(self, pos:int) -> int:
+        '''
+        Returns the offset of the first valid chunk header at or after pos, or
+        the file size if there is none. A header is only accepted if it is
+        packet aligned and the size it claims lands on another header (or the
+        end of the file), which rules out "TPX3" showing up inside packet data.
+        '''
+        if self.map is None:
+            return 0
+        while pos < self.size:
+            i = self.map.find(self.HEADER, pos)
+            if i < 0:
+                break
+            if i % 8 == 0 and i + 8 <= self.size:
+                nxt = i + 8 + int.from_bytes(self.map[i+6:i+8], 'little')
+                if nxt == self.size or \
+                    self.map[nxt:nxt+4] == self.HEADER:
+                    return i
+            pos = i + 1
+        return self.size
+
+    def chunks(self):
+        '''
+        Yields (start, stop) byte offsets covering the whole file
+        '''
+        start = 0
+        while True: # always yield once so empty files behave like before
+            if start + self.chunk_size < self.size:
+                stop = self.align(start + self.chunk_size)
+            else:
+                stop = self.size
+            yield (start, stop)
+            start = stop
+            if start >= self.size:
+                break
+
+    def is_whole(self, start:int, stop:int) -> bool:
+        return start == 0 and stop >= self.size
+
+    def stage(self, start:int, stop:int) -> str:
+        '''
+        Writes the bytes [start, stop) into a temporary .tpx3 file in
+        stage_dir for the tpx3_toolkit functions, which only take file names.
+        The caller is responsible for removing the file.
+        '''
+        (fd, part) = tempfile.mkstemp(suffix='.tpx3', prefix='.pixgui_', \
+                                      dir=stage_dir(self.file_name))
+        with os.fdopen(fd, 'wb') as f:
+            if self.map is not None:
+                with memoryview(self.map) as view:
+                    f.write(view[start:stop])
+        return part
+
+    def packets(self, start:int, stop:int) -> np.ndarray:
+        '''
+        Returns the 64 bit packets of the bytes [start, stop) as a view into the
+        memory map. The view must be dropped before the stream is closed.
+        '''
+        if self.map is None:
+            return np.zeros(0, dtype='<u8')
+        return np.frombuffer(self.map, dtype='<u8', \
+                             count=(stop - start) // 8, offset=start)
+
+    def hit_map(self, start:int, stop:int) -> np.ndarray:
+        '''
+        Returns a 256x256 image of the pixel hits in the bytes [start, stop)
+        '''
+        (x, y) = decode_hits(self.packets(start, stop))
+        counts = np.bincount(x * 256 + y, minlength=256*256)
+        return counts.reshape((256,256))
+
+    def process(self, start:int, stop:int, *args) -> np.ndarray:
+        '''
+        Runs t3.process_Coincidences on the bytes [start, stop). args are all
+        of the arguments of t3.process_Coincidences after the file name.
+        '''
+        if self.is_whole(start, stop):
+            return t3.process_Coincidences(self.file_name, *args)
+        part = self.stage(start, stop)
+        try:
+            return t3.process_Coincidences(part, *args)
+        finally:
+            os.remove(part)
+
+def decode_hits(packets:np.ndarray) -> tuple[np.ndarray,np.ndarray]:
+    '''
+    Decodes the (x, y) pixel address of every pixel hit packet in a raw packet
+    array. Chunk headers, TDC and any other packets are skipped.
+    '''
+    # chunk headers are the only packets with "TPX3" in their low 4 bytes
+    packets = packets[(packets & 0xFFFFFFFF) != 0x33585054]
+    packets = packets[(packets >> 60) == 0xB]
+    dcol = (packets & 0x0FE0000000000000) >> 52
+    spix = (packets & 0x001F800000000000) >> 45
+    pix = (packets & 0x0000700000000000) >> 44
+    x = (dcol + (pix >> 2)).astype(np.intp)
+    y = (spix + (pix & 0x3)).astype(np.intp)
+    return (x, y)
+
+class HitMapSampler:
+    '''
+    Builds the hit map of a raw file from evenly spaced blocks of it, so that a
+    preview of a multi-GB file does not need the file to be parsed. The first
+    block is sampled straight away by first(), and run() (meant for a
+    background thread) keeps adding blocks until the budget is spent.
+
+    # Parameters
+    file_name:str
+        The raw file to sample
+    block_MB:float
+        The size of each sampled block in MB
+    budget_MB:float
+        The total number of MB to sample. The whole file is used if it is
+        smaller than this.
+    '''
+    def __init__(self, file_name:str, block_MB:float=16, budget_MB:float=512):
+        self.file_name = file_name
+        self.counts = np.zeros((256,256), dtype=np.int64)
+        self.sampled = 0
+
+        with RawFileStream(file_name, block_MB) as stream:
+            self.size = stream.size
+            block = int(block_MB * 1024**2)
+            budget = int(budget_MB * 1024**2)
+            if stream.size <= budget:
+                self.blocks = list(stream.chunks())
+            else:
+                starts = np.linspace(0, stream.size, budget // block, \
+                                     endpoint=False)
+                self.blocks = []
+                for start in starts:
+                    start = stream.align(int(start))
+                    stop = stream.align(start + block)
+                    if len(self.blocks) == 0 or start >= self.blocks[-1][1]:
+                        self.blocks.append((start, stop))
+        self.remaining = self.blocks.copy()
+        self.key = parse_cache.key('hits', file_identity(file_name), \
+                                   self.blocks)
+
+    def first(self) -> np.ndarray:
+        # a file which has been fully sampled before is read back instead
+        cached = parse_cache.get(self.key)
+        if cached is not None:
+            self.counts = cached['counts']
+            self.remaining = []
+        else:
+            self.sample(1)
+        return self.counts
+
+    def run(self, progress:Progress|None=None, \
+            token:CancelToken|None=None):
+        if progress is not None:
+            progress.begin(sum(stop - start for (start, stop) \
+                               in self.remaining), 'Sampling hits')
+        self.sample(len(self.remaining), progress, token)
+
+    def sample(self, num_blocks:int, progress:Progress|None=None, \
+               token:CancelToken|None=None):
+        with RawFileStream(self.file_name) as stream:
+            for _ in range(num_blocks):
+                if len(self.remaining) == 0:
+                    break
+                if token is not None:
+                    token.check()
+                (start, stop) = self.remaining.pop(0)
+                # replace rather than add in place so readers never see a
+                # half updated image
+                self.counts = self.counts + stream.hit_map(start, stop)
+                self.sampled += stop - start
+                if progress is not None:
+                    progress.advance(stop - start)
+        if len(self.remaining) == 0:
+            parse_cache.put(self.key, counts=self.counts)
+
+TAIL_MB = 500 # the most a step of following takes on when chunk_MB is 0
+
+class FileTail:
+    '''
+    Follows a raw file which is still being written, handing out only the
+    bytes appended since what was last handed out (offset). Ranges always end
+    on a complete chunk, so a chunk which is still being written is left for
+    the next one, and are at most about chunk_MB long, so a file which
+    already holds a lot when following starts is caught up with in steps.
+
+    # Parameters
+    file_name:str
+        The raw file being written
+    chunk_MB:float
+        The most MB handed out at once, 0 for TAIL_MB
+    '''
+    def __init__(self, file_name:str, chunk_MB:float=0):
+        self.file_name = file_name
+        self.offset = 0
+        self.chunk_size = int((chunk_MB if chunk_MB > 0 else TAIL_MB) * \
+                              1024**2)
+
+    def next_range(self, stream:RawFileStream) -> tuple[int,int]:
+        '''
+        Returns the (start, stop) byte offsets of the complete chunks after
+        offset. Steps through every chunk header, so it is meant to run in
+        the background.
+        '''
+        (start, stop) = (self.offset, self.offset)
+        while stream.map is not None and stop + 8 <= stream.size:
+            header = stream.map[stop:stop+8]
+            if header[:4] != RawFileStream.HEADER:
+                break
+            nxt = stop + 8 + int.from_bytes(header[6:8], 'little')
+            if nxt > stream.size:
+                break # not completely written yet
+            if nxt - start > self.chunk_size and stop > start:
+                break # the rest is left for the next step
+            stop = nxt
+        return (start, stop)
+
+def tail_step(tail:FileTail, *args, progress:Progress|None=None, \
+              token:CancelToken|None=None) \
+                                -> tuple[int,bool,np.ndarray,np.ndarray]:
+    '''
+    Decodes the hit map and processes the coincidences of only the next
+    range of a growing file. args are all of the arguments of
+    t3.process_Coincidences after the file name. Returns where the range
+    stopped, whether more was already written after it, the hit map and the
+    coincidences.
+    '''
+    with RawFileStream(tail.file_name) as stream:
+        (start, stop) = tail.next_range(stream)
+        more = stop < stream.size
+        if stop == start:
+            return (stop, more, np.zeros((256,256), dtype=np.int64), \
+                    np.zeros((2,3,0)))
+        if progress is not None:
+            progress.begin(stop - start, 'Following')
+        counts = stream.hit_map(start, stop)
+        if token is not None:
+            token.check()
+        # the file will have grown, so never treat the range as the whole file
+        part = stream.stage(start, stop)
+    try:
+        data = t3.process_Coincidences(part, *args)
+    finally:
+        os.remove(part)
+    if progress is not None:
+        progress.advance(stop - start)
+    return (stop, more, counts, data)
+
+def merge_coincidences(results:list[np.ndarray]) -> np.ndarray:
+    '''
+    Joins the (2, k, N) coincidence arrays of consecutive chunks into one
+    '''
+    non_empty = [r for r in results if r.ndim == 3 and r.shape[2] > 0]
+    if len(non_empty) == 0:
+        return results[0] if len(results) > 0 else np.zeros((2,3,0))
+    if len(non_empty) == 1:
+        return non_empty[0]
+    return np.concatenate(non_empty, axis=2)
+
+def process_stream(file_name:str, chunk_MB:float, *args, \
+                   progress:Progress|None=None, \
+                   token:CancelToken|None=None) -> np.ndarray:
+    '''
+    Processes the coincidences of a raw file chunk by chunk straight from a
+    memory map of it, rather than chopping the file up on disk first. args are
+    all of the arguments of t3.process_Coincidences after the file name.
+    '''
+    if progress is None:
+        progress = Progress()
+    if token is None:
+        token = CancelToken()
+
+    with RawFileStream(file_name, chunk_MB) as stream:
+        chunks = list(stream.chunks())
+        progress.begin(stream.size, f'Processing chunk 1/{len(chunks)}')
+        results = []
+        for (i, (start, stop)) in enumerate(chunks):
+            token.check()
+            results.append(stream.process(start, stop, *args))
+            if i + 1 < len(chunks):
+                progress.advance(stop - start, \
+                                 f'Processing chunk {i+2}/{len(chunks)}')
+            else:
+                progress.advance(stop - start, 'Merging chunks')
+    return merge_coincidences(results)
+
+def process_range(file_name:str, start:int, stop:int, args:tuple) \
+                                                                -> np.ndarray:
+    # module level so that it can be sent to worker processes
+    with RawFileStream(file_name) as stream:
+        return stream.process(start, stop, *args)
+
+def process_parallel(file_name:str, chunk_MB:float, *args, \
+                     progress:Progress|None=None, \
+                     token:CancelToken|None=None) -> np.ndarray:
+    '''
+    The same as process_stream, but every chunk is processed at the same time
+    in a pool of worker processes (one per core). The results are put back in
+    file order, which is the order the acquisition was recorded in.
+
+    tpx3_toolkit only takes file names, so each worker writes its chunk to a
+    short-lived file in stage_dir while the toolkit works on it; there are
+    never more workers than chunks that fit in that directory's free space.
+    '''
+    with RawFileStream(file_name, chunk_MB) as stream:
+        chunks = list(stream.chunks())
+        size = stream.size
+    if len(chunks) == 1:
+        return process_stream(file_name, 0, *args, progress=progress, \
+                              token=token)
+    if progress is None:
+        progress = Progress()
+    if token is None:
+        token = CancelToken()
+
+    largest = max(stop - start for (start, stop) in chunks)
+    room = shutil.disk_usage(stage_dir(file_name)).free // max(1, largest)
+    workers = max(1, min(len(chunks), os.cpu_count() or 1, room))
+    progress.begin(size, f'Processing {len(chunks)} chunks on {workers} cores')
+    # spawn rather than fork since this is called from a thread of a Tk app
+    pool = ProcessPoolExecutor(max_workers=workers, \
+                               mp_context=multiprocessing.get_context('spawn'))
+    try:
+        futures = {pool.submit(process_range, file_name, start, stop, args): \
+                   stop - start for (start, stop) in chunks}
+        pending = set(futures)
+        while len(pending) > 0:
+            # wake up regularly so a cancel does not wait for a whole chunk
+            (done, pending) = wait(pending, timeout=0.25, \
+                                   return_when=FIRST_COMPLETED)
+            token.check()
+            for future in done:
+                progress.advance(futures[future])
+        progress.stage = 'Merging chunks'
+        results = [future.result() for future in futures]
+    except BaseException:
+        # on a cancel or error, chunks which are already running in a worker
+        # are left to finish on their own
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return merge_coincidences(results)
+
+def coincidence_key(file_name:str, chunk_MB:float, *args) -> str:
+    '''
+    The result_cache key of processing file_name with the arguments args (all
+    of the arguments of t3.process_Coincidences after the file name). Files are
+    identified by their contents and beam lists by their string form.
+    '''
+    parts = [file_identity(file_name), float(chunk_MB)]
+    for arg in args:
+        if isinstance(arg, list):
+            parts.append(tuple(str(a) for a in arg))
+        elif isinstance(arg, str) and os.path.isfile(arg):
+            parts.append(file_identity(arg))
+        else:
+            parts.append(arg)
+    return result_cache.key('coincidences', *parts)
+
+def cached_coincidences(file_name:str, chunk_MB:float, *args, \
+                        progress:Progress|None=None, \
+                        token:CancelToken|None=None) -> np.ndarray | None:
+    '''
+    Returns the coincidences of an earlier run with exactly the same
+    arguments, or None if there is none. The coincidence window is part of
+    the key: how t3.process_Coincidences pairs photons is not known here, so
+    a result for a wider window is never narrowed down to stand in for one.
+    '''
+    if progress is not None:
+        progress.stage = 'Reading cache'
+    cached = result_cache.get(coincidence_key(file_name, chunk_MB, *args))
+    if cached is None:
+        return None
+    return cached['coincidences']
+
+def process_cached(target, file_name:str, chunk_MB:float, *args, \
+                   progress:Progress|None=None, \
+                   token:CancelToken|None=None) -> np.ndarray:
+    '''
+    Runs target (process_stream or process_parallel) unless the exact same
+    processing has been done before, in which case the result is read back
+    from result_cache instead
+    '''
+    if progress is None:
+        progress = Progress()
+
+    progress.stage = 'Checking cache'
+    data = cached_coincidences(file_name, chunk_MB, *args)
+    if data is not None:
+        return data
+
+    data = target(file_name, chunk_MB, *args, progress=progress, token=token)
+    progress.stage = 'Saving to cache'
+    result_cache.put(coincidence_key(file_name, chunk_MB, *args), \
+                     coincidences=data)
+    return data